@@ -1,32 +1,294 @@
 from __future__ import annotations
 
-import json
-
-from openai import AsyncOpenAI
-
-from config import OPENAI_API_KEY, MODEL_NAME
+import asyncio
+import hashlib
+import logging
+import random
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from functools import lru_cache
+from typing import TypeVar
+
+import httpx
+import orjson
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+
+from config import (
+    LARGE_MODEL_NAME,
+    OPENAI_API_KEY,
+    OPENAI_MAX_CONCURRENCY,
+    OPENAI_RESPONSE_CACHE,
+    SMALL_MODEL_NAME,
+    SUMMARY_MODEL_NAME,
+)
 from models import NegotiationDecision, Product, SupplierProfile
 
-# Lazy client — instantiated on first use so import succeeds without an API key.
+logger = logging.getLogger(__name__)
+
+# Shared client — created by init_client() at app startup, or lazily on first
+# use so the module can be imported (and tested) without an API key.
 _client: AsyncOpenAI | None = None
 
+# Caps in-flight OpenAI requests across all sessions so parallel rounds queue
+# locally instead of exhausting the connection pool or tripping 429s.
+_SEM = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+
+def _new_client() -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+        ),
+        # Retries are handled by _create_completion so the backoff policy lives
+        # in one place instead of multiplying with the SDK's own.
+        max_retries=0,
+    )
+
 
 def _get_client() -> AsyncOpenAI:
     global _client
     if _client is None:
-        _client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+        _client = _new_client()
     return _client
 
 
+def init_client() -> None:
+    """Create the shared client at app startup, if an API key is configured."""
+    global _client
+    if _client is None and OPENAI_API_KEY:
+        _client = _new_client()
+
+
+async def close_client() -> None:
+    """Close the shared client's connection pool at app shutdown."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+def _log_cache_usage(label: str, completion) -> None:
+    """Log how many prompt tokens OpenAI served from its prompt cache."""
+    usage = getattr(completion, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", None)
+    logger.debug(
+        "%s: prompt_tokens=%s cached_tokens=%s",
+        label, getattr(usage, "prompt_tokens", None), cached,
+    )
+
+
+# ---------------------------------------------------------------------------
+# Retry with backoff
+# ---------------------------------------------------------------------------
+
+# APITimeoutError subclasses APIConnectionError. Anything else (bad request,
+# auth, schema errors) fails immediately.
+_RETRYABLE_ERRORS = (RateLimitError, APIConnectionError, InternalServerError)
+_RETRY_ATTEMPTS = 5
+_RETRY_MIN_DELAY = 1.0
+_RETRY_MAX_DELAY = 30.0
+
+T = TypeVar("T")
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    """Seconds to wait before the next attempt: retry-after if given, else full jitter."""
+    response = getattr(exc, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers["retry-after"]), _RETRY_MAX_DELAY)
+        except (KeyError, ValueError):
+            pass
+    ceiling = min(_RETRY_MAX_DELAY, _RETRY_MIN_DELAY * 2 ** attempt)
+    return random.uniform(_RETRY_MIN_DELAY, ceiling)
+
+
+async def _call_with_retry(label: str, make_call: Callable[[], Awaitable[T]]) -> T:
+    """Await make_call() with exponential backoff on transient errors.
+
+    Callers hold _SEM, so a throttled request keeps its slot while it waits —
+    which is the point: under 429s the whole process should send less.
+    """
+    for attempt in range(1, _RETRY_ATTEMPTS + 1):
+        try:
+            return await make_call()
+        except _RETRYABLE_ERRORS as exc:
+            if attempt == _RETRY_ATTEMPTS:
+                raise
+            delay = _retry_delay(exc, attempt)
+            logger.warning(
+                "%s: %s (attempt %d/%d), retrying in %.1fs",
+                label, type(exc).__name__, attempt, _RETRY_ATTEMPTS, delay,
+            )
+            await asyncio.sleep(delay)
+
+
+async def _create_completion(label: str, **kwargs):
+    """chat.completions.create with retries; the caller holds _SEM."""
+    return await _call_with_retry(label, lambda: _get_client().chat.completions.create(**kwargs))
+
+
+async def _limited_call(label: str, make_call: Callable[[], Awaitable[T]]) -> T:
+    """Run a non-chat OpenAI call (files, batches) under _SEM with retries."""
+    async with _SEM:
+        return await _call_with_retry(label, make_call)
+
+
+# ---------------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------------
+
+# Identical requests (same catalog, quantities, note and seeded opening prices)
+# yield identical turns across replays, so replies can be cached on a digest of
+# the full request. Bounded LRU to cap memory. The cache is shared by every
+# session in the process and replays sampled output verbatim, so it only runs
+# when OPENAI_RESPONSE_CACHE is enabled.
+_RESPONSE_CACHE_SIZE = 256
+_response_cache: OrderedDict[str, str] = OrderedDict()
+
+
+def _cache_key(messages: list[dict], kwargs: dict) -> str:
+    payload = orjson.dumps([messages, kwargs], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> str | None:
+    if not OPENAI_RESPONSE_CACHE:
+        return None
+    reply = _response_cache.get(key)
+    if reply is not None:
+        _response_cache.move_to_end(key)
+    return reply
+
+
+def _cache_put(key: str, reply: str) -> None:
+    if not OPENAI_RESPONSE_CACHE:
+        return
+    _response_cache[key] = reply
+    _response_cache.move_to_end(key)
+    if len(_response_cache) > _RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+async def _cached_completion(label: str, messages: list[dict], **kwargs) -> str:
+    """Return the reply content for a chat completion, served from cache when possible."""
+    key = _cache_key(messages, kwargs)
+    reply = _cache_get(key)
+    if reply is not None:
+        logger.debug("%s: response cache hit", label)
+        return reply
+
+    async with _SEM:
+        completion = await _create_completion(label, messages=messages, **kwargs)
+    _log_cache_usage(label, completion)
+
+    reply = completion.choices[0].message.content
+    _cache_put(key, reply)
+    return reply
+
+
+# ---------------------------------------------------------------------------
+# History compaction
+# ---------------------------------------------------------------------------
+
+# Prefill cost grows with every turn re-sent to the model. Once a thread holds
+# more than the last two turn pairs (plus the pending message), older turns are
+# folded into a single summary message placed right after the fixed head.
+_KEEP_RECENT_MESSAGES = 4
+_SUMMARY_PREFIX = "Prior negotiation summary:"
+
+
+def _is_summary(message: dict) -> bool:
+    return message["role"] == "system" and message["content"].startswith(_SUMMARY_PREFIX)
+
+
+async def _compact_history(history: list[dict], head: int) -> None:
+    """Summarise turns between the first `head` messages and the recent tail, in place.
+
+    Failures are logged and leave the history untouched — compaction only
+    saves tokens, it must never break a negotiation.
+    """
+    end = len(history) - (_KEEP_RECENT_MESSAGES + 1)
+    body_start = head + 1 if len(history) > head and _is_summary(history[head]) else head
+    if end <= body_start:
+        return
+
+    transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in history[head:end])
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "Summarise this footwear sourcing negotiation transcript in a few sentences. "
+                "Preserve every concrete price, discount, lead time, payment term, material "
+                "swap and concession, and who offered it."
+            ),
+        },
+        {"role": "user", "content": transcript},
+    ]
+    try:
+        summary = await _cached_completion(
+            "History summary",
+            messages,
+            model=SUMMARY_MODEL_NAME,
+            temperature=0,
+        )
+    except Exception as exc:
+        logger.warning("History compaction failed, keeping full history: %s", exc)
+        return
+
+    history[head:end] = [{"role": "system", "content": f"{_SUMMARY_PREFIX} {summary}"}]
+
+
 # ---------------------------------------------------------------------------
 # Supplier Agent
 # ---------------------------------------------------------------------------
 
-def _build_supplier_system_prompt(supplier: SupplierProfile, products: list[Product]) -> str:
+def _opening_prices(supplier: SupplierProfile, products: Sequence[Product]) -> dict[str, float]:
+    """Opening per-unit FOB quotes: targetFob × price_multiplier, varied ±3% per product.
+
+    The RNG is seeded from the supplier id and catalog codes (a str seed, which
+    unlike hash() is stable across processes), so a supplier quoting the same
+    catalog always opens at the same prices.
+    """
+    return dict(_opening_prices_cached(supplier, tuple(products)))
+
+
+# Deterministic per (supplier, catalog), so computed once and shared by the
+# prompt builder and every SupplierAgent; callers get a fresh dict.
+@lru_cache(maxsize=8)
+def _opening_prices_cached(
+    supplier: SupplierProfile,
+    products: tuple[Product, ...],
+) -> tuple[tuple[str, float], ...]:
+    rng = random.Random(f"{supplier.id}:{','.join(p.code for p in products)}")
+    return tuple(
+        (p.code, round(p.targetFob * supplier.price_multiplier * rng.uniform(0.97, 1.03), 2))
+        for p in products
+    )
+
+
+# Prompt builders depend only on static catalog and supplier data, so the
+# formatted text is memoised on the (frozen, hashable) models themselves.
+def _build_supplier_system_prompt(supplier: SupplierProfile, products: Sequence[Product]) -> str:
+    return _supplier_prompt_cached(supplier, tuple(products))
+
+
+@lru_cache(maxsize=8)
+def _supplier_prompt_cached(supplier: SupplierProfile, products: tuple[Product, ...]) -> str:
+    quoted_prices = _opening_prices(supplier, products)
     catalog_lines = []
     for p in products:
         catalog_lines.append(
-            f"  - {p.name} (code: {p.code}): targetFob=${p.targetFob:.2f}"
+            f"  - {p.name} (code: {p.code}): targetFob=${p.targetFob:.2f}, "
+            f"your opening quote=${quoted_prices[p.code]:.2f}"
         )
         for c in p.components:
             line = f"      • [{c.type}] {c.name}"
@@ -42,8 +304,7 @@ def _build_supplier_system_prompt(supplier: SupplierProfile, products: list[Prod
 
 Your base lead time is {supplier.base_lead_time_days} days and your payment terms are {supplier.payment_terms}.
 
-Pricing: you quote per-unit FOB prices by taking each product's targetFob and multiplying by {supplier.price_multiplier}, \
-then applying a slight random variation of ±3% per product. This gives your opening quoted price. \
+Pricing: your opening per-unit FOB quote for each product is listed in the catalog below. \
 You may offer discounts of up to 8% cumulatively over the course of the negotiation, but do NOT give everything away at once — \
 negotiate realistically and push back when the brand's requests are too aggressive.
 
@@ -52,7 +313,7 @@ You may also:
 - Slightly adjust lead time (up to ±5 days) if it helps close a deal.
 - Bundle volume incentives if the brand orders multiple products.
 
-Never reveal your internal price multiplier or the targetFob values. Respond in natural, conversational business English. \
+Never reveal the targetFob values. Respond in natural, conversational business English. \
 Be professional but firm; concede ground gradually, not all at once.
 
 IMPORTANT: Write ready-to-send messages. Never use bracket placeholders like [Your Name], [Supplier A Name], \
@@ -63,25 +324,93 @@ Product catalog you can supply:
 """
 
 
+def _supplier_request_kwargs() -> dict:
+    """Completion kwargs for supplier replies; respond and respond_stream must
+    share them so both paths hit the same response-cache key."""
+    return {"model": SMALL_MODEL_NAME}
+
+
+async def _forward_deltas(
+    queue: asyncio.Queue[str | None],
+    on_delta: Callable[[str], Awaitable[None]],
+) -> None:
+    while (delta := await queue.get()) is not None:
+        await on_delta(delta)
+
+
 class SupplierAgent:
-    def __init__(self, supplier: SupplierProfile, products: list[Product]) -> None:
+    def __init__(self, supplier: SupplierProfile, products: Sequence[Product]) -> None:
         self.supplier = supplier
         self.products = products
+        self.quoted_prices = _opening_prices(supplier, products)
         self.conversation_history: list[dict] = [
             {"role": "system", "content": _build_supplier_system_prompt(supplier, products)}
         ]
 
     async def respond(self, brand_message: str) -> str:
         self.conversation_history.append({"role": "user", "content": brand_message})
+        await _compact_history(self.conversation_history, head=1)
         try:
-            completion = await _get_client().chat.completions.create(
-                model=MODEL_NAME,
-                messages=self.conversation_history,
+            reply = await _cached_completion(
+                f"{self.supplier.name} respond",
+                self.conversation_history,
+                **_supplier_request_kwargs(),
             )
         except Exception as exc:
             raise RuntimeError(f"{self.supplier.name} LLM call failed: {exc}") from exc
 
-        reply = completion.choices[0].message.content
+        self.conversation_history.append({"role": "assistant", "content": reply})
+        return reply
+
+    async def respond_stream(
+        self,
+        brand_message: str,
+        on_delta: Callable[[str], Awaitable[None]],
+    ) -> str:
+        """Like respond(), but forwards each content delta to on_delta as it arrives."""
+        self.conversation_history.append({"role": "user", "content": brand_message})
+        await _compact_history(self.conversation_history, head=1)
+
+        request_kwargs = _supplier_request_kwargs()
+        key = _cache_key(self.conversation_history, request_kwargs)
+        cached = _cache_get(key)
+        if cached is not None:
+            await on_delta(cached)
+            self.conversation_history.append({"role": "assistant", "content": cached})
+            return cached
+
+        # Deltas are forwarded by a separate task so a slow client only delays
+        # its own socket: the OpenAI slot is released as soon as the stream ends.
+        parts: list[str] = []
+        queue: asyncio.Queue[str | None] = asyncio.Queue()
+        forwarder = asyncio.create_task(_forward_deltas(queue, on_delta))
+        try:
+            async with _SEM:
+                stream = await _create_completion(
+                    f"{self.supplier.name} respond",
+                    messages=self.conversation_history,
+                    stream=True,
+                    stream_options={"include_usage": True},
+                    **request_kwargs,
+                )
+                async for chunk in stream:
+                    # The final chunk carries usage only, with no choices.
+                    if not chunk.choices:
+                        _log_cache_usage(f"{self.supplier.name} respond", chunk)
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        queue.put_nowait(delta)
+            queue.put_nowait(None)
+            await forwarder
+        except Exception as exc:
+            raise RuntimeError(f"{self.supplier.name} LLM call failed: {exc}") from exc
+        finally:
+            forwarder.cancel()
+
+        reply = "".join(parts)
+        _cache_put(key, reply)
         self.conversation_history.append({"role": "assistant", "content": reply})
         return reply
 
@@ -91,15 +420,21 @@ class SupplierAgent:
 # ---------------------------------------------------------------------------
 
 def _build_brand_system_prompt(
-    products: list[Product],
+    products: Sequence[Product],
     suppliers: list[SupplierProfile],
-    quantities: dict[str, int],
-    note: str | None,
 ) -> str:
-    product_lines = []
-    for p in products:
-        qty = quantities.get(p.code, 0)
-        product_lines.append(f"  - {p.name} (code: {p.code}), qty: {qty} units")
+    return _brand_prompt_cached(tuple(products), tuple(suppliers))
+
+
+@lru_cache(maxsize=8)
+def _brand_prompt_cached(
+    products: tuple[Product, ...],
+    suppliers: tuple[SupplierProfile, ...],
+) -> str:
+    # Only static catalog/supplier metadata goes here so the system prompt is a
+    # byte-identical prefix across sessions (OpenAI prompt caching). Per-run
+    # quantities and the user note live in _build_order_context instead.
+    product_lines = [f"  - {p.name} (code: {p.code})" for p in products]
 
     supplier_lines = [
         f"  - {s.name} (id: {s.id}): quality {s.quality_rating}/5, "
@@ -107,17 +442,12 @@ def _build_brand_system_prompt(
         for s in suppliers
     ]
 
-    note_section = (
-        f"\nThe brand team has this additional note: {note}" if note else ""
-    )
-
     return (
         "You are Alex Chen, Senior Procurement Manager at UrbanStride Footwear.\n\n"
         "You are sourcing the following products:\n"
         + "\n".join(product_lines)
         + "\n\nYou know these suppliers and their quality ratings:\n"
         + "\n".join(supplier_lines)
-        + note_section
         + "\n\nYour goal: negotiate the best overall deal balancing cost, quality, "
         "lead time, and payment terms. Push for lower prices, better terms, and "
         "faster delivery. Be professional but firm. Do not reveal what other "
@@ -131,6 +461,27 @@ def _build_brand_system_prompt(
     )
 
 
+def _build_order_context(
+    products: Sequence[Product],
+    quantities: dict[str, int],
+    note: str | None,
+) -> str:
+    quantity_lines = [
+        f"  - {p.name} (code: {p.code}), qty: {quantities.get(p.code, 0)} units"
+        for p in products
+    ]
+
+    note_section = (
+        f"\n\nThe brand team has this additional note: {note}" if note else ""
+    )
+
+    return (
+        "Order details for this negotiation — quantities required:\n"
+        + "\n".join(quantity_lines)
+        + note_section
+    )
+
+
 # Strict-mode-compatible schema: comparison is an array of per-supplier objects.
 # OpenAI strict mode requires additionalProperties:false on every object and all
 # properties listed in required — dynamic-key dicts are not permitted.
@@ -168,11 +519,21 @@ _DECISION_SCHEMA = {
     "additionalProperties": False,
 }
 
+# Built once: passed as-is on every decision request (live and batch).
+_DECISION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "NegotiationDecision",
+        "strict": True,
+        "schema": _DECISION_SCHEMA,
+    },
+}
+
 
 class BrandAgent:
     def __init__(
         self,
-        products: list[Product],
+        products: Sequence[Product],
         suppliers: list[SupplierProfile],
         quantities: dict[str, int],
         note: str | None = None,
@@ -180,34 +541,39 @@ class BrandAgent:
         self.products = products
         self.suppliers = suppliers
         self.quantities = quantities
-        self._system_prompt = _build_brand_system_prompt(products, suppliers, quantities, note)
+        self._supplier_by_id = {s.id: s for s in suppliers}
+        self._system_prompt = _build_brand_system_prompt(products, suppliers)
+        self._order_context = _build_order_context(products, quantities, note)
         # One conversation history per supplier_id
         self.conversation_histories: dict[int, list[dict]] = {
-            s.id: [{"role": "system", "content": self._system_prompt}]
+            s.id: [
+                {"role": "system", "content": self._system_prompt},
+                {"role": "user", "content": self._order_context},
+            ]
             for s in suppliers
         }
 
-    async def generate_rfq(self, supplier_name: str) -> str:
-        messages = [
-            {"role": "system", "content": self._system_prompt},
-            {
-                "role": "user",
-                "content": (
-                    f"Generate an RFQ message addressed to {supplier_name}, listing the "
-                    "products and quantities you need quoted. Keep it concise and professional. "
-                    "Sign off with your name and title only — no placeholder contact information."
-                ),
-            },
-        ]
+    async def generate_rfq(self, supplier_id: int) -> str:
+        # Runs on the supplier's own thread so it shares the exact prompt prefix
+        # with the later counter-proposal calls (OpenAI prompt caching).
+        history = self.conversation_histories[supplier_id]
+        supplier_name = self._supplier_by_id[supplier_id].name
+        history.append({
+            "role": "user",
+            "content": (
+                f"Generate an RFQ message addressed to {supplier_name}, listing the "
+                "products and quantities you need quoted. Keep it concise and professional. "
+                "Sign off with your name and title only — no placeholder contact information."
+            ),
+        })
         try:
-            completion = await _get_client().chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-            )
+            rfq = await _cached_completion("Brand RFQ", history, model=SMALL_MODEL_NAME)
         except Exception as exc:
             raise RuntimeError(f"Brand RFQ generation failed: {exc}") from exc
 
-        return completion.choices[0].message.content
+        # Replace the raw instruction with the actual RFQ so history reads naturally
+        history[-1] = {"role": "user", "content": rfq}
+        return rfq
 
     async def generate_counter(
         self,
@@ -227,7 +593,7 @@ class BrandAgent:
                 f"{all_quotes_summary}]"
             )
 
-        supplier_name = next(s.name for s in self.suppliers if s.id == supplier_id)
+        supplier_name = self._supplier_by_id[supplier_id].name
         user_content = (
             f"You are negotiating with {supplier_name}. Based on their response above, "
             "write a professional counter-proposal or follow-up addressed to them by name. "
@@ -236,23 +602,21 @@ class BrandAgent:
             + competitive_hint
         )
         history.append({"role": "user", "content": user_content})
+        # Head is the system prompt plus the order-context message.
+        await _compact_history(history, head=2)
 
         try:
-            completion = await _get_client().chat.completions.create(
-                model=MODEL_NAME,
-                messages=history,
-            )
+            reply = await _cached_completion("Brand counter", history, model=SMALL_MODEL_NAME)
         except Exception as exc:
             raise RuntimeError(f"Brand counter-proposal generation failed: {exc}") from exc
 
-        reply = completion.choices[0].message.content
         # Replace the raw instruction with the actual reply so history reads naturally
         history[-1] = {"role": "user", "content": reply}
         return reply
 
-    async def make_decision(self, final_offers: dict[int, str]) -> NegotiationDecision:
+    def _decision_messages(self, final_offers: dict[int, str]) -> list[dict]:
         supplier_summaries = "\n\n".join(
-            f"--- {next(s.name for s in self.suppliers if s.id == sid)} (id: {sid}) ---\n{offer}"
+            f"--- {self._supplier_by_id[sid].name} (id: {sid}) ---\n{offer}"
             for sid, offer in final_offers.items()
         )
 
@@ -273,34 +637,117 @@ class BrandAgent:
             "The comparison field must contain one entry per supplier."
         )
 
-        messages = [
+        return [
             {"role": "system", "content": self._system_prompt},
+            {"role": "user", "content": self._order_context},
             {"role": "user", "content": decision_prompt},
         ]
 
+    async def make_decision(self, final_offers: dict[int, str]) -> NegotiationDecision:
+        messages = self._decision_messages(final_offers)
+
         try:
-            completion = await _get_client().chat.completions.create(
-                model=MODEL_NAME,
-                messages=messages,
-                response_format={
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": "NegotiationDecision",
-                        "strict": True,
-                        "schema": _DECISION_SCHEMA,
-                    },
-                },
+            content = await _cached_completion(
+                "Brand decision",
+                messages,
+                model=LARGE_MODEL_NAME,
+                response_format=_DECISION_RESPONSE_FORMAT,
             )
         except Exception as exc:
             raise RuntimeError(f"Brand decision generation failed: {exc}") from exc
 
-        data = json.loads(completion.choices[0].message.content)
-
-        # Convert comparison array → dict keyed by supplier_name for NegotiationDecision
-        comparison_list: list[dict] = data.pop("comparison", [])
-        data["comparison"] = {
-            item["supplier_name"]: {k: v for k, v in item.items() if k != "supplier_name"}
-            for item in comparison_list
+        return _parse_decision(content)
+
+    async def make_decision_batch(self, final_offers: dict[int, str]) -> str:
+        """Submit the decision request to the OpenAI Batch API and return the batch id.
+
+        Batch requests cost half as much but resolve asynchronously (up to
+        24h); poll the result with fetch_batch_decision().
+        """
+        request = {
+            "custom_id": "decision",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": LARGE_MODEL_NAME,
+                "messages": self._decision_messages(final_offers),
+                "response_format": _DECISION_RESPONSE_FORMAT,
+            },
         }
-
-        return NegotiationDecision(**data)
+        try:
+            client = _get_client()
+            batch_file = await _limited_call(
+                "Brand decision batch upload",
+                lambda: client.files.create(
+                    file=("decision.jsonl", orjson.dumps(request) + b"\n"),
+                    purpose="batch",
+                ),
+            )
+            batch = await _limited_call(
+                "Brand decision batch create",
+                lambda: client.batches.create(
+                    input_file_id=batch_file.id,
+                    endpoint="/v1/chat/completions",
+                    completion_window="24h",
+                ),
+            )
+        except Exception as exc:
+            raise RuntimeError(f"Brand decision batch submission failed: {exc}") from exc
+
+        return batch.id
+
+
+def _parse_decision(content: str) -> NegotiationDecision:
+    data = orjson.loads(content)
+
+    # Convert comparison array → dict keyed by supplier_name for NegotiationDecision
+    comparison_list: list[dict] = data.pop("comparison", [])
+    data["comparison"] = {
+        item["supplier_name"]: {k: v for k, v in item.items() if k != "supplier_name"}
+        for item in comparison_list
+    }
+
+    # Strict structured output already guarantees the schema, so skip the
+    # redundant Pydantic validation pass.
+    return NegotiationDecision.model_construct(**data)
+
+
+_BATCH_FAILED_STATUSES = {"failed", "expired", "cancelling", "cancelled"}
+
+
+async def _first_batch_line(client: AsyncOpenAI, file_id: str | None) -> dict | None:
+    """First JSONL record of a batch output/error file, or None if absent or empty."""
+    if not file_id:
+        return None
+    content = await _limited_call("Brand decision batch file", lambda: client.files.content(file_id))
+    lines = content.text.splitlines()
+    return orjson.loads(lines[0]) if lines else None
+
+
+def _batch_error_message(result: dict) -> str:
+    body = (result.get("response") or {}).get("body") or {}
+    error = body.get("error") or result.get("error") or {}
+    return error.get("message") or str(error or body)
+
+
+async def fetch_batch_decision(batch_id: str) -> NegotiationDecision | None:
+    """Return the decision for a finished batch, or None while it is still running."""
+    try:
+        client = _get_client()
+        batch = await _limited_call("Brand decision batch retrieve", lambda: client.batches.retrieve(batch_id))
+        if batch.status in _BATCH_FAILED_STATUSES:
+            raise RuntimeError(f"batch {batch_id} ended with status {batch.status}")
+        if batch.status != "completed":
+            return None
+        # A request that failed is written to the error file, not the output file.
+        result = await _first_batch_line(client, batch.output_file_id)
+        if result is None:
+            result = await _first_batch_line(client, batch.error_file_id)
+        if result is None:
+            raise RuntimeError(f"batch {batch_id} completed without any result")
+        response = result.get("response") or {}
+        if response.get("status_code") != 200:
+            raise RuntimeError(f"decision request failed: {_batch_error_message(result)}")
+        return _parse_decision(response["body"]["choices"][0]["message"]["content"])
+    except Exception as exc:
+        raise RuntimeError(f"Brand decision batch retrieval failed: {exc}") from exc
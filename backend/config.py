@@ -4,4 +4,13 @@ import os
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-MODEL_NAME = os.getenv("MODEL_NAME", "gpt-4o")
+# Small model for negotiation turns (supplier replies, RFQs, counters); large
+# model only for the final structured decision. MODEL_NAME is still honoured
+# as the large model for existing deployments.
+SMALL_MODEL_NAME = os.getenv("SMALL_MODEL_NAME", "gpt-4o-mini")
+LARGE_MODEL_NAME = os.getenv("LARGE_MODEL_NAME", os.getenv("MODEL_NAME", "gpt-4o"))
+SUMMARY_MODEL_NAME = os.getenv("SUMMARY_MODEL_NAME", SMALL_MODEL_NAME)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+# Process-wide reply cache shared by every session. Off by default: when on,
+# identical requests replay the same sampled reply instead of a fresh one.
+OPENAI_RESPONSE_CACHE = os.getenv("OPENAI_RESPONSE_CACHE", "false").lower() in ("1", "true", "yes")
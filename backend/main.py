@@ -1,21 +1,31 @@
 from __future__ import annotations
 
 import asyncio
-import json
+from contextlib import asynccontextmanager
 from pathlib import Path
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import orjson
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
 
-from agents import BrandAgent, SupplierAgent
-from models import NegotiationRequest
+from agents import BrandAgent, SupplierAgent, close_client, fetch_batch_decision, init_client
+from models import NegotiationDecision, NegotiationRequest
 from suppliers import get_supplier, load_products
 
 NEGOTIATION_ROUNDS = 3
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One OpenAI client (and connection pool) for the app's lifetime.
+    init_client()
+    yield
+    await close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -31,6 +41,18 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/decisions/{batch_id}")
+async def batch_decision(batch_id: str):
+    """Poll a decision submitted through the Batch API (start message with batch=true)."""
+    try:
+        decision = await fetch_batch_decision(batch_id)
+    except RuntimeError as exc:
+        raise HTTPException(status_code=502, detail=str(exc)) from exc
+    if decision is None:
+        return {"type": "decision_pending", "batch_id": batch_id}
+    return _decision_event(decision)
+
+
 @app.websocket("/ws/negotiate")
 async def negotiate(ws: WebSocket):
     await ws.accept()
@@ -40,15 +62,16 @@ async def negotiate(ws: WebSocket):
         # 1. Wait for start_negotiation message
         # ------------------------------------------------------------------ #
         raw = await ws.receive_text()
-        payload = json.loads(raw)
+        payload = orjson.loads(raw)
 
         if payload.get("type") != "start_negotiation":
-            await ws.send_json({"type": "error", "message": "Expected start_negotiation message"})
+            await _send(ws, {"type": "error", "message": "Expected start_negotiation message"})
             return
 
         req = NegotiationRequest(
             quantities=payload["quantities"],
             note=payload.get("note"),
+            batch=payload.get("batch", False),
         )
 
         # ------------------------------------------------------------------ #
@@ -56,6 +79,7 @@ async def negotiate(ws: WebSocket):
         # ------------------------------------------------------------------ #
         products = load_products()
         suppliers = [get_supplier(i) for i in (1, 2, 3)]
+        peer_lines = _peer_lines(suppliers)
 
         brand_agent = BrandAgent(
             products=products,
@@ -67,86 +91,78 @@ async def negotiate(ws: WebSocket):
             s.id: SupplierAgent(supplier=s, products=products) for s in suppliers
         }
 
-        await ws.send_json({"type": "status", "message": "Agents initialised. Starting negotiation…"})
-
-        # ------------------------------------------------------------------ #
-        # Helper: stream one message event (brand or supplier turn)
-        # ------------------------------------------------------------------ #
-        async def send_msg(supplier_id: int, role: str, content: str, round_num: int):
-            await ws.send_json({
-                "type": "message",
-                "supplier_id": supplier_id,
-                "role": role,
-                "content": content,
-                "round": round_num,
-            })
+        await _send(ws, {"type": "status", "message": "Agents initialised. Starting negotiation…"})
 
         # ------------------------------------------------------------------ #
         # 3. Round 1 — RFQ
         # ------------------------------------------------------------------ #
-        await ws.send_json({"type": "status", "message": "Round 1 — sending RFQ to all suppliers…"})
+        await _send(ws, {"type": "status", "message": "Round 1 — sending RFQ to all suppliers…"})
 
         # Track the most recent supplier reply per supplier_id
         latest_supplier_replies: dict[int, str] = {}
 
         async def run_round1(supplier_id: int):
-            supplier_name = supplier_agents[supplier_id].supplier.name
-            rfq = await brand_agent.generate_rfq(supplier_name)
-            await send_msg(supplier_id, "brand", rfq, round_num=1)
-            reply = await supplier_agents[supplier_id].respond(rfq)
+            rfq = await brand_agent.generate_rfq(supplier_id)
+            await _send_msg(ws, supplier_id, "brand", rfq, round_num=1)
+            reply = await _stream_supplier_reply(ws, supplier_agents[supplier_id], rfq, round_num=1)
             latest_supplier_replies[supplier_id] = reply
-            await send_msg(supplier_id, "supplier", reply, round_num=1)
 
-        await asyncio.gather(*[run_round1(sid) for sid in supplier_agents])
+        await _run_concurrently(run_round1(sid) for sid in supplier_agents)
 
         # ------------------------------------------------------------------ #
         # 4. Rounds 2 … NEGOTIATION_ROUNDS — counter-proposals
         # ------------------------------------------------------------------ #
         for round_num in range(2, NEGOTIATION_ROUNDS + 1):
-            await ws.send_json({
+            await _send(ws, {
                 "type": "status",
                 "message": f"Round {round_num} — brand generating counter-proposals…",
             })
 
-            async def run_counter_round(supplier_id: int, _rn: int = round_num):
-                supplier_reply = latest_supplier_replies.get(supplier_id, "")
-                peer_summary = _peer_summary(supplier_id, suppliers, latest_supplier_replies)
-
-                counter = await brand_agent.generate_counter(
-                    supplier_id=supplier_id,
-                    supplier_response=supplier_reply,
-                    all_quotes_summary=peer_summary if _rn > 2 else None,
+            await _run_concurrently(
+                _run_counter_round(
+                    ws,
+                    brand_agent,
+                    supplier_agents,
+                    latest_supplier_replies,
+                    suppliers,
+                    peer_lines,
+                    supplier_id=sid,
+                    round_num=round_num,
                 )
-                await send_msg(supplier_id, "brand", counter, round_num=_rn)
-
-                new_reply = await supplier_agents[supplier_id].respond(counter)
-                latest_supplier_replies[supplier_id] = new_reply
-                await send_msg(supplier_id, "supplier", new_reply, round_num=_rn)
-
-            await asyncio.gather(*[run_counter_round(sid) for sid in supplier_agents])
+                for sid in supplier_agents
+            )
 
         # ------------------------------------------------------------------ #
         # 5. Decision
         # ------------------------------------------------------------------ #
-        await ws.send_json({"type": "status", "message": "All rounds complete. Making final decision…"})
+        await _send(ws, {"type": "status", "message": "All rounds complete. Making final decision…"})
+
+        if req.batch:
+            # Not latency-critical: hand the decision to the Batch API and let
+            # the client poll GET /decisions/{batch_id} for the result.
+            batch_id = await brand_agent.make_decision_batch(final_offers=latest_supplier_replies)
+            await _send(ws, {"type": "decision_pending", "batch_id": batch_id})
+            await _send(ws, {"type": "done"})
+            return
 
         decision = await brand_agent.make_decision(final_offers=latest_supplier_replies)
 
-        await ws.send_json({
-            "type": "decision",
-            "winner_supplier_id": decision.winner_supplier_id,
-            "winner_name": decision.winner_name,
-            "reasoning": decision.reasoning,
-            "comparison": decision.comparison,
-        })
+        await _send(ws, _decision_event(decision))
 
-        await ws.send_json({"type": "done"})
+        await _send(ws, {"type": "done"})
 
     except WebSocketDisconnect:
         pass
     except Exception as exc:
         try:
-            await ws.send_json({"type": "error", "message": str(exc)})
+            await _send(ws, {"type": "error", "message": str(exc)})
+        except Exception:
+            pass
+    finally:
+        # uvicorn closes on return anyway; closing explicitly marks the end of
+        # the event stream for any ASGI server (and for TestClient).
+        try:
+            await ws.close()
         except Exception:
             pass
 
@@ -155,21 +171,127 @@ async def negotiate(ws: WebSocket):
 # Helpers
 # ---------------------------------------------------------------------------
 
+async def _send_msg(ws: WebSocket, supplier_id: int, role: str, content: str, round_num: int) -> None:
+    """Send one complete chat turn (brand or supplier) as a message event."""
+    await _send(ws, {
+        "type": "message",
+        "supplier_id": supplier_id,
+        "role": role,
+        "content": content,
+        "round": round_num,
+    })
+
+
+async def _stream_supplier_reply(
+    ws: WebSocket,
+    supplier_agent: SupplierAgent,
+    brand_message: str,
+    round_num: int,
+) -> str:
+    """Stream a supplier reply as message_delta events, closed by one message_end."""
+    supplier_id = supplier_agent.supplier.id
+
+    async def on_delta(chunk: str):
+        await _send(ws, {
+            "type": "message_delta",
+            "supplier_id": supplier_id,
+            "role": "supplier",
+            "chunk": chunk,
+            "round": round_num,
+        })
+
+    reply = await supplier_agent.respond_stream(brand_message, on_delta)
+    await _send(ws, {
+        "type": "message_end",
+        "supplier_id": supplier_id,
+        "role": "supplier",
+        "content": reply,
+        "round": round_num,
+    })
+    return reply
+
+
+async def _run_counter_round(
+    ws: WebSocket,
+    brand_agent: BrandAgent,
+    supplier_agents: dict[int, SupplierAgent],
+    latest_supplier_replies: dict[int, str],
+    suppliers: list,
+    peer_lines: dict[int, str],
+    supplier_id: int,
+    round_num: int,
+) -> None:
+    """One counter-proposal exchange with a single supplier (rounds 2+)."""
+    supplier_reply = latest_supplier_replies.get(supplier_id, "")
+    peer_summary = _peer_summary(supplier_id, suppliers, latest_supplier_replies, peer_lines)
+
+    counter = await brand_agent.generate_counter(
+        supplier_id=supplier_id,
+        supplier_response=supplier_reply,
+        all_quotes_summary=peer_summary if round_num > 2 else None,
+    )
+    await _send_msg(ws, supplier_id, "brand", counter, round_num=round_num)
+
+    new_reply = await _stream_supplier_reply(
+        ws, supplier_agents[supplier_id], counter, round_num=round_num
+    )
+    latest_supplier_replies[supplier_id] = new_reply
+
+
+def _decision_event(decision: NegotiationDecision) -> dict:
+    """Plain dict for the decision event — no model_dump round trip."""
+    return {
+        "type": "decision",
+        "winner_supplier_id": decision.winner_supplier_id,
+        "winner_name": decision.winner_name,
+        "reasoning": decision.reasoning,
+        "comparison": decision.comparison,
+    }
+
+
+async def _run_concurrently(coros) -> None:
+    """Run coroutines in a TaskGroup; the first failure cancels the rest and is re-raised."""
+    try:
+        async with asyncio.TaskGroup() as tg:
+            for coro in coros:
+                tg.create_task(coro)
+    except BaseExceptionGroup as group:
+        # Surface the original error (not the group wrapper) to the error event.
+        raise group.exceptions[0]
+
+
+async def _send(ws: WebSocket, payload: dict) -> None:
+    """Send a JSON event, serialised with orjson, as a text frame."""
+    await ws.send_text(orjson.dumps(payload).decode())
+
+
+def _peer_lines(suppliers: list) -> dict[int, str]:
+    """Pre-format each supplier's peer-summary line, leaving only {mention} to fill."""
+    return {
+        s.id: (
+            f"  - {s.name} (quality {s.quality_rating}/5, lead {s.base_lead_time_days}d) "
+            f"{{mention}} — appears {'competitive' if s.price_multiplier <= 1.0 else 'higher-priced'}."
+        )
+        for s in suppliers
+    }
+
+
 def _peer_summary(
     exclude_supplier_id: int,
     suppliers: list,
     replies: dict[int, str],
+    peer_lines: dict[int, str] | None = None,
 ) -> str:
     """Return a relative description of other suppliers' offers (no exact figures)."""
-    peers = [s for s in suppliers if s.id != exclude_supplier_id]
+    if peer_lines is None:
+        peer_lines = _peer_lines(suppliers)
     lines = []
-    for s in peers:
+    for s in suppliers:
+        if s.id == exclude_supplier_id:
+            continue
         reply = replies.get(s.id, "")
         mention = "has quoted" if "$" in reply else "has responded"
-        lines.append(
-            f"  - {s.name} (quality {s.quality_rating}/5, lead {s.base_lead_time_days}d) "
-            f"{mention} — appears {'competitive' if s.price_multiplier <= 1.0 else 'higher-priced'}."
-        )
+        lines.append(peer_lines[s.id].format(mention=mention))
     return "Other suppliers in this negotiation:\n" + "\n".join(lines)
 
 
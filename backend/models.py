@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 from typing import Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class ProductComponent(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     type: str
     name: str
     composition: Optional[str] = None
@@ -12,15 +14,20 @@ class ProductComponent(BaseModel):
 
 
 class Product(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     code: str
     name: str
     description: str
     targetFob: float
     categoryPath: str
-    components: list[ProductComponent]
+    # A tuple keeps Product hashable, so it can key the agents prompt caches.
+    components: tuple[ProductComponent, ...]
 
 
 class SupplierProfile(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
     id: int
     name: str
     quality_rating: float
@@ -32,6 +39,7 @@ class SupplierProfile(BaseModel):
 class NegotiationRequest(BaseModel):
     quantities: dict[str, int]
     note: Optional[str] = None
+    batch: bool = False
 
 
 class NegotiationDecision(BaseModel):
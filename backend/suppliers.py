@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-import json
+from functools import lru_cache
 from pathlib import Path
 
+from pydantic import BaseModel, ConfigDict
+
 from models import Product, SupplierProfile
 
 SUPPLIERS: list[SupplierProfile] = [
@@ -35,13 +37,28 @@ SUPPLIERS: list[SupplierProfile] = [
 _PRODUCTS_PATH = Path(__file__).parent / "products.json"
 
 
-def load_products() -> list[Product]:
-    data = json.loads(_PRODUCTS_PATH.read_text())
-    return [Product(**p) for p in data["products"]]
+class _Catalog(BaseModel):
+    """Shape of products.json; other top-level keys are ignored."""
+
+    model_config = ConfigDict(extra="ignore")
+
+    products: tuple[Product, ...]
+
+
+# Products are immutable reference data: parse and validate them once per process.
+# A tuple, so no caller can mutate the cached catalog.
+@lru_cache(maxsize=1)
+def load_products() -> tuple[Product, ...]:
+    # Validates the raw file bytes in pydantic-core; no intermediate Python dicts.
+    return _Catalog.model_validate_json(_PRODUCTS_PATH.read_bytes()).products
+
+
+# Lookup table built once at import time.
+_SUPPLIERS_BY_ID: dict[int, SupplierProfile] = {s.id: s for s in SUPPLIERS}
 
 
 def get_supplier(id: int) -> SupplierProfile:
-    for supplier in SUPPLIERS:
-        if supplier.id == id:
-            return supplier
-    raise ValueError(f"No supplier with id={id}")
+    try:
+        return _SUPPLIERS_BY_ID[id]
+    except KeyError:
+        raise ValueError(f"No supplier with id={id}") from None
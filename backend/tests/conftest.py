@@ -8,7 +8,10 @@ sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
 
 import pytest
 from unittest.mock import AsyncMock, MagicMock, patch
+from starlette.testclient import TestClient
 
+import agents
+from main import app
 from suppliers import load_products, SUPPLIERS
 
 
@@ -29,9 +32,9 @@ def fake_completion(content: str) -> MagicMock:
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def products():
-    """Load and return all products from products.json."""
+    """Load and return all products from products.json (an immutable tuple, so shared)."""
     return load_products()
 
 
@@ -53,6 +56,19 @@ def quantities():
     }
 
 
+@pytest.fixture
+def brand_agent(products, suppliers, quantities):
+    """Fresh BrandAgent per test — generate_* calls mutate its per-supplier histories."""
+    return agents.BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """One TestClient for the session, so app lifespan runs once rather than per test."""
+    with TestClient(app) as c:
+        yield c
+
+
 @pytest.fixture(autouse=True)
 def mock_openai():
     """
@@ -60,7 +76,15 @@ def mock_openai():
     accidentally reach the real OpenAI API.  Tests that configure specific
     LLM responses receive the mock client via fixture injection.
     """
-    client = AsyncMock()
-    client.chat.completions.create.return_value = fake_completion("Mocked LLM response.")
+    # Namespaces are plain attributes on the real client; only the endpoints
+    # are awaited, so only they are AsyncMocks.
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=fake_completion("Mocked LLM response."))
+    client.files.create = AsyncMock()
+    client.files.content = AsyncMock()
+    client.batches.create = AsyncMock()
+    client.batches.retrieve = AsyncMock()
+    # Replies cached by one test must not leak into the next.
+    agents._response_cache.clear()
     with patch("agents._get_client", return_value=client):
         yield client
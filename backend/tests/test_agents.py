@@ -1,12 +1,25 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import re
+from types import SimpleNamespace
 
+import httpx
+import openai
 import pytest
-from unittest.mock import MagicMock
-
-from agents import BrandAgent, SupplierAgent
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import agents
+from agents import (
+    BrandAgent,
+    SupplierAgent,
+    _build_brand_system_prompt,
+    _build_supplier_system_prompt,
+    fetch_batch_decision,
+)
 from models import NegotiationDecision
+from suppliers import SUPPLIERS, load_products
 
 
 # ---------------------------------------------------------------------------
@@ -21,6 +34,19 @@ def _fake_completion(content: str) -> MagicMock:
     return completion
 
 
+def _fake_stream(*deltas: str):
+    """Return an async iterator mimicking a streamed ChatCompletion."""
+    async def _gen():
+        for d in deltas:
+            chunk = MagicMock()
+            chunk.choices[0].delta.content = d
+            yield chunk
+        usage_chunk = MagicMock()
+        usage_chunk.choices = []
+        yield usage_chunk
+    return _gen()
+
+
 # Valid structured-output JSON that matches _DECISION_SCHEMA
 _DECISION_JSON = json.dumps({
     "winner_supplier_id": 2,
@@ -54,6 +80,29 @@ _DECISION_JSON = json.dumps({
     ],
 })
 
+# RuntimeError messages raised by the agents, compiled once.
+_LLM_CALL_FAILED = re.compile("LLM call failed")
+_RFQ_FAILED = re.compile("RFQ generation failed")
+_COUNTER_FAILED = re.compile("counter-proposal generation failed")
+_DECISION_FAILED = re.compile("decision generation failed")
+_BATCH_SUBMIT_FAILED = re.compile("batch submission failed")
+_BATCH_RETRIEVE_FAILED = re.compile("batch retrieval failed")
+
+_SUPPLIER_NAMES = frozenset({"Supplier A", "Supplier B", "Supplier C"})
+_ASSESSMENT_KEYS = frozenset({
+    "cost_assessment",
+    "quality_assessment",
+    "lead_time_assessment",
+    "payment_terms_assessment",
+    "overall_score",
+})
+
+# Completion stubs are only read, never mutated, so build them once.
+_DECISION_COMPLETION = _fake_completion(_DECISION_JSON)
+_RFQ_COMPLETION = _fake_completion("RFQ.")
+_COUNTER_COMPLETION = _fake_completion("Counter.")
+_OFFER_COMPLETION = _fake_completion("My offer.")
+
 
 # ---------------------------------------------------------------------------
 # SupplierAgent
@@ -73,16 +122,58 @@ class TestSupplierAgent:
         agent = SupplierAgent(supplier=suppliers[1], products=products)
         assert "4.7" in agent.conversation_history[0]["content"]
 
-    @pytest.mark.asyncio
-    async def test_respond_returns_llm_reply(self, mock_openai, products, suppliers):
-        mock_openai.chat.completions.create.return_value = _fake_completion("Here is my quote.")
+    def test_opening_prices_are_deterministic(self, products, suppliers):
+        a = SupplierAgent(supplier=suppliers[0], products=products)
+        b = SupplierAgent(supplier=suppliers[0], products=products)
+        assert a.quoted_prices == b.quoted_prices
+
+    def test_opening_prices_are_not_shared_between_agents(self, products, suppliers):
+        a = SupplierAgent(supplier=suppliers[0], products=products)
+        b = SupplierAgent(supplier=suppliers[0], products=products)
+        a.quoted_prices[products[0].code] = 0.0
+        assert b.quoted_prices[products[0].code] > 0
+
+    def test_opening_prices_within_three_percent_of_multiplied_fob(self, products, suppliers):
+        supplier = suppliers[2]
+        agent = SupplierAgent(supplier=supplier, products=products)
+        for p in products:
+            base = p.targetFob * supplier.price_multiplier
+            assert base * 0.97 - 0.01 <= agent.quoted_prices[p.code] <= base * 1.03 + 0.01
+
+    def test_opening_prices_use_the_given_profile(self, products, suppliers):
+        other = suppliers[0].model_copy(update={"price_multiplier": 2.0})
+        agent = SupplierAgent(supplier=other, products=products)
+        for p in products:
+            assert agent.quoted_prices[p.code] >= p.targetFob * 2.0 * 0.97 - 0.01
+
+    def test_accepts_profile_outside_suppliers_list(self, products, suppliers):
+        agent = SupplierAgent(supplier=suppliers[0].model_copy(update={"id": 9}), products=products)
+        assert set(agent.quoted_prices) == {p.code for p in products}
+
+    def test_system_prompt_lists_opening_quotes(self, products, suppliers):
         agent = SupplierAgent(supplier=suppliers[0], products=products)
-        reply = await agent.respond("Please quote 1 000 units.")
-        assert reply == "Here is my quote."
+        price = agent.quoted_prices[products[0].code]
+        assert f"your opening quote=${price:.2f}" in agent.conversation_history[0]["content"]
+
+    def test_system_prompt_is_memoised(self, products, suppliers):
+        a = _build_supplier_system_prompt(suppliers[0], products)
+        b = _build_supplier_system_prompt(suppliers[0], list(products))
+        assert a is b
+        assert _build_supplier_system_prompt(suppliers[1], products) != a
+
+    def test_system_prompt_uses_the_given_profile(self, products, suppliers):
+        other = suppliers[0].model_copy(update={"name": "Other", "price_multiplier": 2.0})
+        agent = SupplierAgent(supplier=other, products=products)
+        prompt = agent.conversation_history[0]["content"]
+        assert "You are Other" in prompt
+        assert f"your opening quote=${agent.quoted_prices[products[0].code]:.2f}" in prompt
+
+    async def test_respond_uses_small_model(self, mock_openai, products, suppliers):
+        await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert mock_openai.chat.completions.create.call_args.kwargs["model"] == agents.SMALL_MODEL_NAME
 
-    @pytest.mark.asyncio
     async def test_respond_appends_user_message_to_history(self, mock_openai, products, suppliers):
-        mock_openai.chat.completions.create.return_value = _fake_completion("My offer.")
+        mock_openai.chat.completions.create.return_value = _OFFER_COMPLETION
         agent = SupplierAgent(supplier=suppliers[0], products=products)
         await agent.respond("What can you offer?")
         # system + user + assistant = 3
@@ -90,15 +181,13 @@ class TestSupplierAgent:
         assert agent.conversation_history[1]["role"] == "user"
         assert agent.conversation_history[1]["content"] == "What can you offer?"
 
-    @pytest.mark.asyncio
     async def test_respond_appends_assistant_reply_to_history(self, mock_openai, products, suppliers):
-        mock_openai.chat.completions.create.return_value = _fake_completion("My offer.")
+        mock_openai.chat.completions.create.return_value = _OFFER_COMPLETION
         agent = SupplierAgent(supplier=suppliers[0], products=products)
         await agent.respond("What can you offer?")
         assert agent.conversation_history[2]["role"] == "assistant"
         assert agent.conversation_history[2]["content"] == "My offer."
 
-    @pytest.mark.asyncio
     async def test_respond_accumulates_history_across_multiple_calls(self, mock_openai, products, suppliers):
         mock_openai.chat.completions.create.return_value = _fake_completion("Response.")
         agent = SupplierAgent(supplier=suppliers[1], products=products)
@@ -107,47 +196,368 @@ class TestSupplierAgent:
         # system + 2×(user + assistant) = 5
         assert len(agent.conversation_history) == 5
 
-    @pytest.mark.asyncio
     async def test_respond_raises_runtime_error_on_llm_failure(self, mock_openai, products, suppliers):
         mock_openai.chat.completions.create.side_effect = Exception("connection refused")
         agent = SupplierAgent(supplier=suppliers[0], products=products)
-        with pytest.raises(RuntimeError, match="LLM call failed"):
+        with pytest.raises(RuntimeError, match=_LLM_CALL_FAILED):
             await agent.respond("Hello")
 
+    async def test_respond_stream_forwards_deltas_and_returns_full_reply(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_stream("Here is ", "", "my quote.")
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        received = []
+
+        async def on_delta(chunk):
+            received.append(chunk)
+
+        reply = await agent.respond_stream("Please quote.", on_delta)
+        assert received == ["Here is ", "my quote."]
+        assert reply == "Here is my quote."
+        assert agent.conversation_history[-1] == {"role": "assistant", "content": "Here is my quote."}
+
+    async def test_respond_stream_raises_runtime_error_on_llm_failure(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.side_effect = Exception("connection refused")
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+
+        async def on_delta(chunk):
+            pass
+
+        with pytest.raises(RuntimeError, match=_LLM_CALL_FAILED):
+            await agent.respond_stream("Hello", on_delta)
+
+    async def test_respond_stream_releases_slot_before_slow_client_drains(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_stream("Here is ", "my quote.")
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        client_ready = asyncio.Event()
+
+        async def on_delta(chunk):
+            await client_ready.wait()
+
+        task = asyncio.create_task(agent.respond_stream("Please quote.", on_delta))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert not task.done()
+        assert agents._SEM._value == agents.OPENAI_MAX_CONCURRENCY
+        client_ready.set()
+        assert await task == "Here is my quote."
+
+    async def test_respond_stream_wraps_on_delta_failure(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_stream("Here is ", "my quote.")
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+
+        async def on_delta(chunk):
+            raise ConnectionError("client went away")
+
+        with pytest.raises(RuntimeError, match=_LLM_CALL_FAILED):
+            await agent.respond_stream("Hello", on_delta)
+
 
 # ---------------------------------------------------------------------------
-# BrandAgent — generate_rfq
+# Plain-text calls return the LLM reply unchanged
 # ---------------------------------------------------------------------------
 
-class TestBrandAgentGenerateRfq:
-    @pytest.mark.asyncio
-    async def test_returns_string_from_llm(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("RFQ text here.")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        result = await agent.generate_rfq("Supplier A")
-        assert result == "RFQ text here."
+@pytest.mark.parametrize("method, args", [
+    ("respond", ("Please quote 1 000 units.",)),
+    ("generate_rfq", (1,)),
+    ("generate_counter", (1, "We can offer $15/unit.")),
+])
+async def test_returns_llm_reply(mock_openai, brand_agent, products, suppliers, method, args):
+    mock_openai.chat.completions.create.return_value = _fake_completion("LLM reply.")
+    agent = SupplierAgent(supplier=suppliers[0], products=products) if method == "respond" else brand_agent
+    assert await getattr(agent, method)(*args) == "LLM reply."
 
-    @pytest.mark.asyncio
-    async def test_calls_llm_exactly_once(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("RFQ.")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        await agent.generate_rfq("Supplier A")
+
+# ---------------------------------------------------------------------------
+# Retry with backoff
+# ---------------------------------------------------------------------------
+
+def _rate_limit_error(headers: dict | None = None) -> openai.RateLimitError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class TestRetry:
+    @pytest.fixture(autouse=True)
+    def no_sleep(self):
+        with patch("agents.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            yield sleep
+
+    async def test_rate_limit_is_retried(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.side_effect = [_rate_limit_error(), _fake_completion("Quote.")]
+        reply = await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert reply == "Quote."
+        assert mock_openai.chat.completions.create.call_count == 2
+
+    async def test_retry_after_header_is_respected(self, mock_openai, products, suppliers, no_sleep):
+        mock_openai.chat.completions.create.side_effect = [
+            _rate_limit_error({"retry-after": "7"}),
+            _fake_completion("Quote."),
+        ]
+        await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        no_sleep.assert_awaited_once_with(7.0)
+
+    async def test_gives_up_after_max_attempts(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.side_effect = _rate_limit_error()
+        with pytest.raises(RuntimeError, match=_LLM_CALL_FAILED):
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert mock_openai.chat.completions.create.call_count == agents._RETRY_ATTEMPTS
+
+    async def test_non_transient_error_is_not_retried(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.side_effect = Exception("bad request")
+        with pytest.raises(RuntimeError):
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
         assert mock_openai.chat.completions.create.call_count == 1
 
-    @pytest.mark.asyncio
-    async def test_generates_rfq_per_supplier_independently(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("RFQ.")
+    async def test_batch_calls_are_retried(self, mock_openai, products, suppliers, quantities):
+        mock_openai.files.create.side_effect = [_rate_limit_error(), MagicMock(id="file_1")]
+        mock_openai.batches.create.side_effect = [_rate_limit_error(), _fake_batch("validating")]
         agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        r1 = await agent.generate_rfq("Supplier A")
-        r2 = await agent.generate_rfq("Supplier B")
+        assert await agent.make_decision_batch(final_offers={1: "A", 2: "B", 3: "C"}) == "batch_123"
+        assert mock_openai.files.create.call_count == 2
+        assert mock_openai.batches.create.call_count == 2
+
+    async def test_batch_retrieval_is_retried(self, mock_openai):
+        mock_openai.batches.retrieve.side_effect = [_rate_limit_error(), _fake_batch("in_progress")]
+        assert await fetch_batch_decision("batch_123") is None
+        assert mock_openai.batches.retrieve.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# Real SDK over a mocked httpx transport
+# ---------------------------------------------------------------------------
+
+def _completion_body(content: str) -> dict:
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4o-mini",
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+    }
+
+
+@pytest.fixture
+def sdk_transport():
+    """Swap the AsyncMock client for a real AsyncOpenAI whose transport never leaves the process.
+
+    Exercises the SDK's own request building and response parsing. Queue
+    responses on .responses; requests seen are recorded on .requests.
+    """
+    wire = SimpleNamespace(responses=[], requests=[])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        wire.requests.append(request)
+        return wire.responses.pop(0)
+
+    client = openai.AsyncOpenAI(
+        api_key="sk-test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_retries=0,
+    )
+    with patch("agents._get_client", return_value=client):
+        yield wire
+
+
+class TestSdkTransport:
+    async def test_respond_parses_real_completion(self, sdk_transport, products, suppliers):
+        sdk_transport.responses.append(httpx.Response(200, json=_completion_body("Quote from the wire.")))
+        reply = await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert reply == "Quote from the wire."
+        assert sdk_transport.requests[0].url.path == "/v1/chat/completions"
+
+    async def test_http_429_is_retried(self, sdk_transport, products, suppliers):
+        sdk_transport.responses.extend([
+            httpx.Response(429, headers={"retry-after": "0"}, json={"error": {"message": "slow down"}}),
+            httpx.Response(200, json=_completion_body("Quote.")),
+        ])
+        reply = await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert reply == "Quote."
+        assert len(sdk_transport.requests) == 2
+
+    async def test_http_400_surfaces_as_runtime_error(self, sdk_transport, products, suppliers):
+        sdk_transport.responses.append(httpx.Response(400, json={"error": {"message": "bad request"}}))
+        with pytest.raises(RuntimeError, match=_LLM_CALL_FAILED):
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+
+
+# ---------------------------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------------------------
+
+class TestResponseCache:
+    @pytest.fixture(autouse=True)
+    def cache_enabled(self):
+        with patch.object(agents, "OPENAI_RESPONSE_CACHE", True):
+            yield
+
+    async def test_identical_request_is_served_from_cache(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_completion("Quote.")
+        first = await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        second = await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert first == second == "Quote."
+        assert mock_openai.chat.completions.create.call_count == 1
+
+    async def test_different_request_misses_cache(self, mock_openai, products, suppliers):
+        await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        await SupplierAgent(supplier=suppliers[1], products=products).respond("Hello")
+        assert mock_openai.chat.completions.create.call_count == 2
+
+    async def test_stream_hit_emits_cached_reply_as_single_delta(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_completion("Cached quote.")
+        await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        received = []
+
+        async def on_delta(chunk):
+            received.append(chunk)
+
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        reply = await agent.respond_stream("Hello", on_delta)
+        assert reply == "Cached quote."
+        assert received == ["Cached quote."]
+        assert mock_openai.chat.completions.create.call_count == 1
+
+    async def test_stream_shares_cache_key_when_request_kwargs_change(self, mock_openai, products, suppliers):
+        mock_openai.chat.completions.create.return_value = _fake_completion("Cached quote.")
+        kwargs = {"model": agents.SMALL_MODEL_NAME, "temperature": 0.2}
+        with patch.object(agents, "_supplier_request_kwargs", return_value=kwargs):
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+            agent = SupplierAgent(supplier=suppliers[0], products=products)
+            reply = await agent.respond_stream("Hello", AsyncMock())
+        assert reply == "Cached quote."
+        assert mock_openai.chat.completions.create.call_args.kwargs["temperature"] == 0.2
+        assert mock_openai.chat.completions.create.call_count == 1
+
+    async def test_disabled_cache_always_calls_the_model(self, mock_openai, products, suppliers):
+        with patch.object(agents, "OPENAI_RESPONSE_CACHE", False):
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+            await SupplierAgent(supplier=suppliers[0], products=products).respond("Hello")
+        assert mock_openai.chat.completions.create.call_count == 2
+        assert not agents._response_cache
+
+    def test_cache_evicts_least_recently_used(self):
+        for i in range(agents._RESPONSE_CACHE_SIZE + 1):
+            agents._cache_put(str(i), "reply")
+        assert len(agents._response_cache) == agents._RESPONSE_CACHE_SIZE
+        assert agents._cache_get("0") is None
+
+
+# ---------------------------------------------------------------------------
+# History compaction
+# ---------------------------------------------------------------------------
+
+class TestHistoryCompaction:
+    async def test_default_three_rounds_never_summarise(self, mock_openai, products, suppliers):
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        for i in range(3):
+            await agent.respond(f"Message {i}")
+        assert mock_openai.chat.completions.create.call_count == 3
+        assert len(agent.conversation_history) == 7
+
+    async def test_older_turns_folded_into_summary(self, mock_openai, products, suppliers):
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        for i in range(3):
+            await agent.respond(f"Message {i}")
+        mock_openai.chat.completions.create.return_value = _fake_completion("Summary text.")
+        await agent.respond("Message 3")
+        history = agent.conversation_history
+        assert history[1] == {"role": "system", "content": "Prior negotiation summary: Summary text."}
+        # system + summary + two kept pairs + the new pair
+        assert len(history) == 8
+        assert history[2]["content"] == "Message 1"
+
+    async def test_existing_summary_is_refolded(self, mock_openai, products, suppliers):
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        for i in range(5):
+            await agent.respond(f"Message {i}")
+        history = agent.conversation_history
+        assert sum(m["content"].startswith("Prior negotiation summary:") for m in history) == 1
+        assert len(history) == 8
+        assert history[2]["content"] == "Message 2"
+
+    async def test_summariser_failure_keeps_full_history(self, mock_openai, products, suppliers):
+        agent = SupplierAgent(supplier=suppliers[0], products=products)
+        for i in range(3):
+            await agent.respond(f"Message {i}")
+        mock_openai.chat.completions.create.side_effect = [
+            Exception("summariser down"),
+            _fake_completion("Reply."),
+        ]
+        reply = await agent.respond("Message 3")
+        assert reply == "Reply."
+        assert len(agent.conversation_history) == 9
+
+
+# ---------------------------------------------------------------------------
+# BrandAgent — prompts
+# ---------------------------------------------------------------------------
+
+class TestBrandAgentPrompts:
+    def test_system_prompt_is_independent_of_quantities_and_note(self, products, suppliers, quantities):
+        a = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
+        b = BrandAgent(
+            products=products,
+            suppliers=suppliers,
+            quantities={code: 1 for code in quantities},
+            note="Prioritise lead time.",
+        )
+        assert a.conversation_histories[1][0] == b.conversation_histories[1][0]
+
+    def test_system_prompt_is_memoised(self, products, suppliers):
+        assert _build_brand_system_prompt(products, suppliers) is _build_brand_system_prompt(
+            list(products), list(suppliers)
+        )
+
+    def test_system_prompt_uses_the_given_suppliers(self, products, suppliers):
+        renamed = [s.model_copy(update={"name": f"Vendor {s.id}"}) for s in suppliers]
+        prompt = _build_brand_system_prompt(products, renamed)
+        assert "Vendor 1 (id: 1)" in prompt
+        assert "Supplier A" not in prompt
+
+    def test_history_starts_with_system_then_order_context(self, products, suppliers, quantities):
+        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities, note="Rush order.")
+        history = agent.conversation_histories[1]
+        assert [m["role"] for m in history] == ["system", "user"]
+        assert "10000 units" in history[1]["content"]
+        assert "Rush order." in history[1]["content"]
+
+
+# ---------------------------------------------------------------------------
+# BrandAgent — generate_rfq
+# ---------------------------------------------------------------------------
+
+class TestBrandAgentGenerateRfq:
+    async def test_calls_llm_exactly_once(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _RFQ_COMPLETION
+        await brand_agent.generate_rfq(1)
+        assert mock_openai.chat.completions.create.call_count == 1
+
+    async def test_generates_rfq_per_supplier_independently(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _RFQ_COMPLETION
+        r1 = await brand_agent.generate_rfq(1)
+        r2 = await brand_agent.generate_rfq(2)
         assert r1 == r2 == "RFQ."  # same mock reply, two independent calls
 
-    @pytest.mark.asyncio
-    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, products, suppliers, quantities):
+    async def test_rfq_recorded_in_target_supplier_history(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _RFQ_COMPLETION
+        await brand_agent.generate_rfq(1)
+        assert brand_agent.conversation_histories[1][-1] == {"role": "user", "content": "RFQ."}
+        assert len(brand_agent.conversation_histories[2]) == 2
+
+    async def test_rfq_shares_prefix_with_supplier_thread(self, mock_openai, brand_agent):
+        prefix = list(brand_agent.conversation_histories[1])
+        await brand_agent.generate_rfq(1)
+        sent = mock_openai.chat.completions.create.call_args.kwargs["messages"]
+        assert sent[:2] == prefix
+
+    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, brand_agent):
         mock_openai.chat.completions.create.side_effect = Exception("timeout")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        with pytest.raises(RuntimeError, match="RFQ generation failed"):
-            await agent.generate_rfq("Supplier A")
+        with pytest.raises(RuntimeError, match=_RFQ_FAILED):
+            await brand_agent.generate_rfq(1)
 
 
 # ---------------------------------------------------------------------------
@@ -155,115 +565,172 @@ class TestBrandAgentGenerateRfq:
 # ---------------------------------------------------------------------------
 
 class TestBrandAgentGenerateCounter:
-    @pytest.mark.asyncio
-    async def test_returns_string(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("Counter proposal.")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        result = await agent.generate_counter(
-            supplier_id=1,
-            supplier_response="We can offer $15/unit.",
-        )
-        assert result == "Counter proposal."
-
-    @pytest.mark.asyncio
-    async def test_appends_to_target_supplier_history(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("Counter.")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        len_before = len(agent.conversation_histories[1])
-        await agent.generate_counter(supplier_id=1, supplier_response="S1 offer.")
-        assert len(agent.conversation_histories[1]) > len_before
-
-    @pytest.mark.asyncio
-    async def test_does_not_alter_other_supplier_histories(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion("Counter.")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        len_s2 = len(agent.conversation_histories[2])
-        len_s3 = len(agent.conversation_histories[3])
-        await agent.generate_counter(supplier_id=1, supplier_response="S1 offer.")
-        assert len(agent.conversation_histories[2]) == len_s2
-        assert len(agent.conversation_histories[3]) == len_s3
-
-    @pytest.mark.asyncio
-    async def test_independent_histories_per_supplier(self, mock_openai, products, suppliers, quantities):
+    async def test_appends_to_target_supplier_history(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _COUNTER_COMPLETION
+        len_before = len(brand_agent.conversation_histories[1])
+        await brand_agent.generate_counter(supplier_id=1, supplier_response="S1 offer.")
+        assert len(brand_agent.conversation_histories[1]) > len_before
+
+    async def test_does_not_alter_other_supplier_histories(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _COUNTER_COMPLETION
+        len_s2 = len(brand_agent.conversation_histories[2])
+        len_s3 = len(brand_agent.conversation_histories[3])
+        await brand_agent.generate_counter(supplier_id=1, supplier_response="S1 offer.")
+        assert len(brand_agent.conversation_histories[2]) == len_s2
+        assert len(brand_agent.conversation_histories[3]) == len_s3
+
+    async def test_independent_histories_per_supplier(self, mock_openai, brand_agent):
         """Each supplier has its own separate conversation history from the start."""
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        assert agent.conversation_histories[1] is not agent.conversation_histories[2]
-        assert agent.conversation_histories[2] is not agent.conversation_histories[3]
+        assert brand_agent.conversation_histories[1] is not brand_agent.conversation_histories[2]
+        assert brand_agent.conversation_histories[2] is not brand_agent.conversation_histories[3]
 
-    @pytest.mark.asyncio
-    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, products, suppliers, quantities):
+    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, brand_agent):
         mock_openai.chat.completions.create.side_effect = Exception("rate limit")
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        with pytest.raises(RuntimeError, match="counter-proposal generation failed"):
-            await agent.generate_counter(supplier_id=1, supplier_response="Some offer.")
+        with pytest.raises(RuntimeError, match=_COUNTER_FAILED):
+            await brand_agent.generate_counter(supplier_id=1, supplier_response="Some offer.")
 
 
 # ---------------------------------------------------------------------------
 # BrandAgent — make_decision
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(scope="module")
+def decision():
+    """One make_decision round trip shared by the read-only assertions below."""
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(return_value=_DECISION_COMPLETION)
+    agent = BrandAgent(products=load_products(), suppliers=list(SUPPLIERS), quantities={"FSH013": 10000})
+    with patch("agents._get_client", return_value=client):
+        return asyncio.run(agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"}))
+
+
 class TestBrandAgentMakeDecision:
-    @pytest.mark.asyncio
-    async def test_returns_negotiation_decision_instance(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A offer", 2: "B offer", 3: "C offer"})
+    def test_returns_negotiation_decision_instance(self, decision):
         assert isinstance(decision, NegotiationDecision)
 
-    @pytest.mark.asyncio
-    async def test_winner_supplier_id_correct(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+    async def test_uses_large_model(self, mock_openai, brand_agent):
+        mock_openai.chat.completions.create.return_value = _DECISION_COMPLETION
+        await brand_agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+        assert mock_openai.chat.completions.create.call_args.kwargs["model"] == agents.LARGE_MODEL_NAME
+
+    def test_winner_supplier_id_correct(self, decision):
         assert decision.winner_supplier_id == 2
 
-    @pytest.mark.asyncio
-    async def test_winner_name_correct(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+    def test_winner_name_correct(self, decision):
         assert decision.winner_name == "Supplier B"
 
-    @pytest.mark.asyncio
-    async def test_reasoning_is_non_empty_string(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+    def test_reasoning_is_non_empty_string(self, decision):
         assert isinstance(decision.reasoning, str)
         assert len(decision.reasoning) > 0
 
-    @pytest.mark.asyncio
-    async def test_comparison_is_dict_keyed_by_supplier_name(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+    def test_comparison_is_dict_keyed_by_supplier_name(self, decision):
         assert isinstance(decision.comparison, dict)
-        assert set(decision.comparison.keys()) == {"Supplier A", "Supplier B", "Supplier C"}
+        assert frozenset(decision.comparison) == _SUPPLIER_NAMES
 
-    @pytest.mark.asyncio
-    async def test_comparison_entries_have_expected_assessment_keys(self, mock_openai, products, suppliers, quantities):
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+    def test_comparison_entries_have_expected_assessment_keys(self, decision):
         for entry in decision.comparison.values():
-            assert "cost_assessment" in entry
-            assert "quality_assessment" in entry
-            assert "lead_time_assessment" in entry
-            assert "payment_terms_assessment" in entry
-            assert "overall_score" in entry
-
-    @pytest.mark.asyncio
-    async def test_supplier_name_key_is_stripped_from_entry(self, mock_openai, products, suppliers, quantities):
+            assert _ASSESSMENT_KEYS <= entry.keys()
+
+    def test_supplier_name_key_is_stripped_from_entry(self, decision):
         """The supplier_name key should not appear inside the per-supplier dict."""
-        mock_openai.chat.completions.create.return_value = _fake_completion(_DECISION_JSON)
-        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        decision = await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
         for entry in decision.comparison.values():
             assert "supplier_name" not in entry
 
-    @pytest.mark.asyncio
-    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, products, suppliers, quantities):
+    async def test_raises_runtime_error_on_llm_failure(self, mock_openai, brand_agent):
         mock_openai.chat.completions.create.side_effect = Exception("rate limited")
+        with pytest.raises(RuntimeError, match=_DECISION_FAILED):
+            await brand_agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+
+
+# ---------------------------------------------------------------------------
+# BrandAgent — batch decision
+# ---------------------------------------------------------------------------
+
+def _fake_batch(
+    status: str,
+    output_file_id: str | None = None,
+    error_file_id: str | None = None,
+) -> MagicMock:
+    batch = MagicMock()
+    batch.id = "batch_123"
+    batch.status = status
+    batch.output_file_id = output_file_id
+    batch.error_file_id = error_file_id
+    return batch
+
+
+class TestBrandAgentDecisionBatch:
+    async def test_submits_jsonl_and_returns_batch_id(self, mock_openai, products, suppliers, quantities):
+        mock_openai.files.create.return_value = MagicMock(id="file_1")
+        mock_openai.batches.create.return_value = _fake_batch("validating")
         agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
-        with pytest.raises(RuntimeError, match="decision generation failed"):
-            await agent.make_decision(final_offers={1: "A", 2: "B", 3: "C"})
+        batch_id = await agent.make_decision_batch(final_offers={1: "A", 2: "B", 3: "C"})
+        assert batch_id == "batch_123"
+        _, content = mock_openai.files.create.call_args.kwargs["file"]
+        request = json.loads(content)
+        assert request["url"] == "/v1/chat/completions"
+        assert request["body"]["response_format"]["json_schema"]["name"] == "NegotiationDecision"
+        assert mock_openai.batches.create.call_args.kwargs["input_file_id"] == "file_1"
+
+    async def test_submission_failure_raises_runtime_error(self, mock_openai, products, suppliers, quantities):
+        mock_openai.files.create.side_effect = Exception("quota")
+        agent = BrandAgent(products=products, suppliers=suppliers, quantities=quantities)
+        with pytest.raises(RuntimeError, match=_BATCH_SUBMIT_FAILED):
+            await agent.make_decision_batch(final_offers={1: "A", 2: "B", 3: "C"})
+
+    async def test_fetch_returns_none_while_in_progress(self, mock_openai):
+        mock_openai.batches.retrieve.return_value = _fake_batch("in_progress")
+        assert await fetch_batch_decision("batch_123") is None
+
+    async def test_fetch_parses_completed_output(self, mock_openai):
+        mock_openai.batches.retrieve.return_value = _fake_batch("completed", output_file_id="file_out")
+        line = json.dumps({
+            "custom_id": "decision",
+            "response": {
+                "status_code": 200,
+                "body": {"choices": [{"message": {"content": _DECISION_JSON}}]},
+            },
+            "error": None,
+        })
+        mock_openai.files.content.return_value = MagicMock(text=line + "\n")
+        decision = await fetch_batch_decision("batch_123")
+        assert decision.winner_supplier_id == 2
+        assert frozenset(decision.comparison) == _SUPPLIER_NAMES
+
+    @pytest.mark.parametrize("result", [
+        {"response": {"status_code": 400, "body": {"error": {"message": "bad request"}}}, "error": None},
+        {"response": None, "error": {"code": "server_error", "message": "boom"}},
+    ])
+    async def test_fetch_raises_for_failed_error_line(self, mock_openai, result):
+        mock_openai.batches.retrieve.return_value = _fake_batch("completed", error_file_id="file_err")
+        mock_openai.files.content.return_value = MagicMock(text=json.dumps({"custom_id": "decision", **result}))
+        with pytest.raises(RuntimeError, match=_BATCH_RETRIEVE_FAILED):
+            await fetch_batch_decision("batch_123")
+
+    async def test_fetch_reports_error_file_when_request_failed(self, mock_openai):
+        mock_openai.batches.retrieve.return_value = _fake_batch(
+            "completed", output_file_id=None, error_file_id="file_err"
+        )
+        line = json.dumps({
+            "custom_id": "decision",
+            "response": {
+                "status_code": 429,
+                "body": {"error": {"message": "Rate limit reached for gpt-4o"}},
+            },
+            "error": None,
+        })
+        mock_openai.files.content.return_value = MagicMock(text=line + "\n")
+        with pytest.raises(RuntimeError, match="Rate limit reached for gpt-4o"):
+            await fetch_batch_decision("batch_123")
+        mock_openai.files.content.assert_awaited_once_with("file_err")
+
+    async def test_fetch_raises_for_empty_output_file(self, mock_openai):
+        mock_openai.batches.retrieve.return_value = _fake_batch("completed", output_file_id="file_out")
+        mock_openai.files.content.return_value = MagicMock(text="")
+        with pytest.raises(RuntimeError, match="completed without any result"):
+            await fetch_batch_decision("batch_123")
+
+    async def test_fetch_raises_for_failed_batch(self, mock_openai):
+        mock_openai.batches.retrieve.return_value = _fake_batch("expired")
+        with pytest.raises(RuntimeError, match=_BATCH_RETRIEVE_FAILED):
+            await fetch_batch_decision("batch_123")
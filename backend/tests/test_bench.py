@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import pytest
+
+# Opt-in: `make bench` installs pytest-benchmark; everywhere else this module is skipped.
+pytest.importorskip("pytest_benchmark")
+
+from models import NegotiationDecision, Product, SupplierProfile
+from suppliers import SUPPLIERS
+
+
+# ---------------------------------------------------------------------------
+# Pydantic validation hot paths
+# ---------------------------------------------------------------------------
+
+def test_product_validation(benchmark, products):
+    payloads = [p.model_dump() for p in products]
+    benchmark(lambda: [Product(**p) for p in payloads])
+
+
+def test_supplier_profile_validation(benchmark):
+    payloads = [s.model_dump() for s in SUPPLIERS]
+    benchmark(lambda: [SupplierProfile(**s) for s in payloads])
+
+
+def test_negotiation_decision_validation(benchmark):
+    payload = {
+        "winner_supplier_id": 2,
+        "winner_name": "Supplier B",
+        "reasoning": "Best quality-to-cost ratio.",
+        "comparison": {
+            name: {"cost_assessment": "mid-range", "overall_score": "7/10"}
+            for name in ("Supplier A", "Supplier B", "Supplier C")
+        },
+    }
+    benchmark(NegotiationDecision.model_validate, payload)
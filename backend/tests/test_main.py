@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+import orjson
 import pytest
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 from starlette.testclient import TestClient
 
-from main import app, _peer_summary
+import agents
+from main import app, _peer_lines, _peer_summary, _run_counter_round
 from models import NegotiationDecision
 from suppliers import SUPPLIERS
 
@@ -20,13 +26,50 @@ class _MockSupplierAgent:
     async def respond(self, message: str) -> str:
         return f"Supplier {self.supplier.id}: competitive offer received."
 
+    async def respond_stream(self, message: str, on_delta) -> str:
+        reply = await self.respond(message)
+        for chunk in (reply[:10], reply[10:]):
+            await on_delta(chunk)
+        return reply
+
+
+# Built once: the mock brand agent hands back the same decision every run.
+_MOCK_DECISION = NegotiationDecision(
+    winner_supplier_id=1,
+    winner_name="Supplier A",
+    reasoning="Best overall value considering all factors.",
+    comparison={
+        "Supplier A": {
+            "cost_assessment": "Cheapest",
+            "quality_assessment": "Medium",
+            "lead_time_assessment": "Slow",
+            "payment_terms_assessment": "Flexible 33/33/33",
+            "overall_score": "8/10",
+        },
+        "Supplier B": {
+            "cost_assessment": "Mid-range",
+            "quality_assessment": "High",
+            "lead_time_assessment": "Medium",
+            "payment_terms_assessment": "30/70",
+            "overall_score": "7/10",
+        },
+        "Supplier C": {
+            "cost_assessment": "Expensive",
+            "quality_assessment": "Medium",
+            "lead_time_assessment": "Fastest",
+            "payment_terms_assessment": "30/70",
+            "overall_score": "6/10",
+        },
+    },
+)
+
 
 class _MockBrandAgent:
     def __init__(self, products, suppliers, quantities, note=None):
         self.suppliers = suppliers
 
-    async def generate_rfq(self, supplier_name: str) -> str:
-        return f"RFQ addressed to {supplier_name}."
+    async def generate_rfq(self, supplier_id: int) -> str:
+        return f"RFQ addressed to supplier {supplier_id}."
 
     async def generate_counter(
         self,
@@ -36,35 +79,11 @@ class _MockBrandAgent:
     ) -> str:
         return f"Counter-proposal to supplier {supplier_id}."
 
+    async def make_decision_batch(self, final_offers: dict) -> str:
+        return "batch_123"
+
     async def make_decision(self, final_offers: dict) -> NegotiationDecision:
-        return NegotiationDecision(
-            winner_supplier_id=1,
-            winner_name="Supplier A",
-            reasoning="Best overall value considering all factors.",
-            comparison={
-                "Supplier A": {
-                    "cost_assessment": "Cheapest",
-                    "quality_assessment": "Medium",
-                    "lead_time_assessment": "Slow",
-                    "payment_terms_assessment": "Flexible 33/33/33",
-                    "overall_score": "8/10",
-                },
-                "Supplier B": {
-                    "cost_assessment": "Mid-range",
-                    "quality_assessment": "High",
-                    "lead_time_assessment": "Medium",
-                    "payment_terms_assessment": "30/70",
-                    "overall_score": "7/10",
-                },
-                "Supplier C": {
-                    "cost_assessment": "Expensive",
-                    "quality_assessment": "Medium",
-                    "lead_time_assessment": "Fastest",
-                    "payment_terms_assessment": "30/70",
-                    "overall_score": "6/10",
-                },
-            },
-        )
+        return _MOCK_DECISION
 
 
 # ---------------------------------------------------------------------------
@@ -79,86 +98,154 @@ _QUANTITIES = {
     "FSH021": 5000,
 }
 
+# _peer_summary takes a list; build it once rather than per test.
+_SUPPLIERS_LIST = list(SUPPLIERS)
+
+_SUPPLIER_IDS = frozenset(s.id for s in SUPPLIERS)
+
 _AGENT_PATCHES = {
     "main.BrandAgent": _MockBrandAgent,
     "main.SupplierAgent": _MockSupplierAgent,
 }
 
 
-def _run_negotiation(extra_payload: dict | None = None) -> list[dict]:
-    """Open a WebSocket, run a full negotiation, and return all received messages."""
+def _start_payload(extra_payload: dict | None) -> dict:
     payload = {"type": "start_negotiation", "quantities": _QUANTITIES}
     if extra_payload:
         payload.update(extra_payload)
+    return payload
 
+
+def _run_negotiation(client: TestClient, extra_payload: dict | None = None) -> list[dict]:
+    """Open a WebSocket, run a full negotiation, and return all received messages."""
     with patch("main.BrandAgent", _MockBrandAgent), patch("main.SupplierAgent", _MockSupplierAgent):
-        with TestClient(app) as client:
-            with client.websocket_connect("/ws/negotiate") as ws:
-                ws.send_json(payload)
-                messages = []
-                while True:
-                    data = ws.receive_json()
-                    messages.append(data)
-                    if data["type"] in ("done", "error"):
-                        break
-    return messages
+        with client.websocket_connect("/ws/negotiate") as ws:
+            ws.send_json(_start_payload(extra_payload))
+            # The server closes after done/error: drain raw frames, parse once.
+            frames = []
+            while (frame := ws.receive())["type"] == "websocket.send":
+                frames.append(frame["text"])
+    return [orjson.loads(f) for f in frames]
+
+
+def _iter_events(ws) -> Iterator[dict]:
+    while True:
+        data = orjson.loads(ws.receive_text())
+        yield data
+        if data["type"] in ("done", "error"):
+            return
+
+
+@contextmanager
+def _negotiation_events(
+    client: TestClient,
+    extra_payload: dict | None = None,
+    supplier_agent: type = _MockSupplierAgent,
+) -> Iterator[Iterator[dict]]:
+    """Yield an iterator over events up to done/error; callers may stop early.
+
+    The agent patches and the socket are released when the block exits, even
+    if iteration stopped early or an assertion failed.
+    """
+    with patch("main.BrandAgent", _MockBrandAgent), patch("main.SupplierAgent", supplier_agent):
+        with client.websocket_connect("/ws/negotiate") as ws:
+            ws.send_json(_start_payload(extra_payload))
+            yield _iter_events(ws)
+
+
+@pytest.fixture(scope="module")
+def negotiation_messages(client) -> list[dict]:
+    """One default negotiation replay shared by the read-only happy-path tests."""
+    return _run_negotiation(client)
+
+
+@pytest.fixture(scope="module")
+def negotiation_types(negotiation_messages) -> list[str]:
+    return [m["type"] for m in negotiation_messages]
+
+
+@pytest.fixture(scope="module")
+def negotiation_type_set(negotiation_types) -> frozenset[str]:
+    return frozenset(negotiation_types)
 
 
 # ---------------------------------------------------------------------------
 # Health check
 # ---------------------------------------------------------------------------
 
-def test_health_returns_200():
-    with TestClient(app) as client:
-        response = client.get("/health")
+def test_health_returns_200(client):
+    response = client.get("/health")
     assert response.status_code == 200
 
 
-def test_health_returns_ok_json():
-    with TestClient(app) as client:
-        response = client.get("/health")
+def test_health_returns_ok_json(client):
+    response = client.get("/health")
     assert response.json() == {"status": "ok"}
 
 
+# ---------------------------------------------------------------------------
+# Lifespan
+# ---------------------------------------------------------------------------
+
+def test_lifespan_opens_and_closes_shared_client():
+    with patch("agents.OPENAI_API_KEY", "sk-test"), patch("agents._client", None):
+        with TestClient(app):
+            assert agents._client is not None
+        assert agents._client is None
+
+
+def test_lifespan_without_api_key_leaves_client_lazy():
+    with patch("agents.OPENAI_API_KEY", None), patch("agents._client", None):
+        with TestClient(app):
+            assert agents._client is None
+
+
 # ---------------------------------------------------------------------------
 # _peer_summary helper
 # ---------------------------------------------------------------------------
 
 class TestPeerSummary:
     def test_excludes_given_supplier_id(self):
-        suppliers = list(SUPPLIERS)
+        suppliers = _SUPPLIERS_LIST
         result = _peer_summary(exclude_supplier_id=1, suppliers=suppliers, replies={1: "", 2: "", 3: ""})
         assert "Supplier A" not in result
         assert "Supplier B" in result
         assert "Supplier C" in result
 
     def test_includes_all_other_suppliers(self):
-        suppliers = list(SUPPLIERS)
+        suppliers = _SUPPLIERS_LIST
+        name_by_id = {s.id: s.name for s in suppliers}
         for exclude_id in (1, 2, 3):
             result = _peer_summary(exclude_id, suppliers, replies={1: "", 2: "", 3: ""})
-            excluded_name = next(s.name for s in suppliers if s.id == exclude_id)
-            assert excluded_name not in result
+            assert name_by_id[exclude_id] not in result
             for s in suppliers:
                 if s.id != exclude_id:
                     assert s.name in result
 
     def test_result_starts_with_header(self):
-        result = _peer_summary(1, list(SUPPLIERS), replies={})
+        result = _peer_summary(1, _SUPPLIERS_LIST, replies={})
         assert result.startswith("Other suppliers")
 
     def test_dollar_sign_in_reply_triggers_has_quoted(self):
         replies = {2: "We can offer $14.00 per unit.", 3: ""}
-        result = _peer_summary(1, list(SUPPLIERS), replies=replies)
+        result = _peer_summary(1, _SUPPLIERS_LIST, replies=replies)
         assert "has quoted" in result
 
     def test_no_dollar_sign_triggers_has_responded(self):
         replies = {2: "We can work with you on this.", 3: ""}
-        result = _peer_summary(1, list(SUPPLIERS), replies=replies)
+        result = _peer_summary(1, _SUPPLIERS_LIST, replies=replies)
         assert "has responded" in result
 
+    def test_precomputed_peer_lines_give_identical_text(self):
+        suppliers = _SUPPLIERS_LIST
+        replies = {2: "We can offer $14.00 per unit.", 3: "Let's talk."}
+        assert _peer_summary(1, suppliers, replies, _peer_lines(suppliers)) == _peer_summary(
+            1, suppliers, replies
+        )
+
     def test_missing_reply_treated_as_empty(self):
         # Supplier 2 has no entry in replies — should not raise
-        result = _peer_summary(1, list(SUPPLIERS), replies={3: "offer"})
+        result = _peer_summary(1, _SUPPLIERS_LIST, replies={3: "offer"})
         assert "Supplier B" in result
         assert "Supplier C" in result
 
@@ -167,54 +254,47 @@ class TestPeerSummary:
 # WebSocket — happy path
 # ---------------------------------------------------------------------------
 
-def test_negotiation_ends_with_done():
-    messages = _run_negotiation()
-    types = [m["type"] for m in messages]
-    assert types[-1] == "done"
+def test_negotiation_ends_with_done(negotiation_types):
+    assert negotiation_types[-1] == "done"
 
 
-def test_negotiation_contains_decision():
-    messages = _run_negotiation()
-    types = [m["type"] for m in messages]
-    assert "decision" in types
+def test_negotiation_contains_decision(negotiation_type_set):
+    assert "decision" in negotiation_type_set
 
 
-def test_negotiation_contains_message_events():
-    messages = _run_negotiation()
-    types = [m["type"] for m in messages]
-    assert "message" in types
+def test_negotiation_contains_message_events(negotiation_type_set):
+    assert "message" in negotiation_type_set
 
 
-def test_negotiation_contains_status_events():
-    messages = _run_negotiation()
-    types = [m["type"] for m in messages]
-    assert "status" in types
+def test_negotiation_contains_status_events(negotiation_type_set):
+    assert "status" in negotiation_type_set
 
 
-def test_negotiation_decision_comes_before_done():
-    messages = _run_negotiation()
-    types = [m["type"] for m in messages]
-    assert types.index("decision") < types.index("done")
+def test_negotiation_decision_comes_before_done(negotiation_types):
+    seen_decision = False
+    for t in negotiation_types:
+        if t == "decision":
+            seen_decision = True
+        elif t == "done":
+            break
+    assert seen_decision
 
 
-def test_negotiation_decision_has_required_fields():
-    messages = _run_negotiation()
-    decision = next(m for m in messages if m["type"] == "decision")
+def test_negotiation_decision_has_required_fields(negotiation_messages):
+    decision = next(m for m in negotiation_messages if m["type"] == "decision")
     assert "winner_supplier_id" in decision
     assert "winner_name" in decision
     assert "reasoning" in decision
     assert "comparison" in decision
 
 
-def test_negotiation_all_three_suppliers_receive_messages():
-    messages = _run_negotiation()
-    chat = [m for m in messages if m["type"] == "message"]
-    assert {m["supplier_id"] for m in chat} == {1, 2, 3}
+def test_negotiation_all_three_suppliers_receive_messages(negotiation_messages):
+    chat = [m for m in negotiation_messages if m["type"] == "message"]
+    assert frozenset(m["supplier_id"] for m in chat) == _SUPPLIER_IDS
 
 
-def test_negotiation_message_events_have_required_fields():
-    messages = _run_negotiation()
-    for msg in (m for m in messages if m["type"] == "message"):
+def test_negotiation_message_events_have_required_fields(negotiation_messages):
+    for msg in (m for m in negotiation_messages if m["type"] == "message"):
         assert "supplier_id" in msg
         assert "role" in msg
         assert msg["role"] in ("brand", "supplier")
@@ -222,49 +302,157 @@ def test_negotiation_message_events_have_required_fields():
         assert "round" in msg
 
 
-def test_negotiation_round_numbers_are_positive():
-    messages = _run_negotiation()
-    for msg in (m for m in messages if m["type"] == "message"):
+def test_negotiation_round_numbers_are_positive(negotiation_messages):
+    for msg in (m for m in negotiation_messages if m["type"] == "message"):
         assert msg["round"] >= 1
 
 
-def test_negotiation_both_roles_appear_per_supplier():
+def test_negotiation_both_roles_appear_per_supplier(negotiation_messages):
     """Each supplier column should have both brand and supplier messages."""
-    messages = _run_negotiation()
     for supplier_id in (1, 2, 3):
-        supplier_msgs = [m for m in messages if m["type"] == "message" and m["supplier_id"] == supplier_id]
+        supplier_msgs = [
+            m for m in negotiation_messages
+            if m["type"] in ("message", "message_end") and m["supplier_id"] == supplier_id
+        ]
         roles = {m["role"] for m in supplier_msgs}
         assert "brand" in roles
         assert "supplier" in roles
 
 
-def test_negotiation_accepts_optional_note():
-    messages = _run_negotiation(extra_payload={"note": "Prioritise lead time over cost."})
-    types = [m["type"] for m in messages]
-    assert "done" in types
+def test_negotiation_supplier_replies_are_streamed(negotiation_messages):
+    """Supplier deltas for a turn concatenate to the content of its message_end."""
+    ends = [m for m in negotiation_messages if m["type"] == "message_end"]
+    assert ends
+    for end in ends:
+        chunks = [
+            m["chunk"] for m in negotiation_messages
+            if m["type"] == "message_delta"
+            and m["supplier_id"] == end["supplier_id"]
+            and m["round"] == end["round"]
+        ]
+        assert "".join(chunks) == end["content"]
+
 
+def test_negotiation_accepts_optional_note(client):
+    with _negotiation_events(client, extra_payload={"note": "Prioritise lead time over cost."}) as events:
+        assert any(m["type"] == "decision" for m in events)
 
-def test_negotiation_works_without_note():
-    messages = _run_negotiation()
+
+def test_negotiation_works_without_note(negotiation_type_set):
+    assert "done" in negotiation_type_set
+
+
+def test_negotiation_batch_emits_decision_pending(client):
+    messages = _run_negotiation(client, extra_payload={"batch": True})
     types = [m["type"] for m in messages]
-    assert "done" in types
+    assert "decision" not in types
+    pending = next(m for m in messages if m["type"] == "decision_pending")
+    assert pending["batch_id"] == "batch_123"
+    assert types[-1] == "done"
+
+
+# ---------------------------------------------------------------------------
+# Batch decision polling
+# ---------------------------------------------------------------------------
+
+def test_batch_decision_pending(client):
+    with patch("main.fetch_batch_decision", AsyncMock(return_value=None)):
+        response = client.get("/decisions/batch_123")
+    assert response.json() == {"type": "decision_pending", "batch_id": "batch_123"}
+
+
+def test_batch_decision_completed(client):
+    with patch("main.fetch_batch_decision", AsyncMock(return_value=_MOCK_DECISION)):
+        response = client.get("/decisions/batch_123")
+    body = response.json()
+    assert body["type"] == "decision"
+    assert body["winner_supplier_id"] == 1
+
+
+def test_batch_decision_failure_returns_502(client):
+    with patch("main.fetch_batch_decision", AsyncMock(side_effect=RuntimeError("expired"))):
+        response = client.get("/decisions/batch_123")
+    assert response.status_code == 502
+
+
+# ---------------------------------------------------------------------------
+# _run_counter_round — exercised without a websocket
+# ---------------------------------------------------------------------------
+
+class _RecordingSocket:
+    def __init__(self):
+        self.events: list[dict] = []
+
+    async def send_text(self, text: str) -> None:
+        self.events.append(orjson.loads(text))
+
+
+async def test_run_counter_round_sends_counter_and_streams_reply(products):
+    ws = _RecordingSocket()
+    supplier_agents = {s.id: _MockSupplierAgent(s, products) for s in SUPPLIERS}
+    replies = {s.id: f"Round 1 reply from {s.id}" for s in SUPPLIERS}
+
+    await _run_counter_round(
+        ws,
+        _MockBrandAgent(products, SUPPLIERS, _QUANTITIES),
+        supplier_agents,
+        replies,
+        SUPPLIERS,
+        _peer_lines(SUPPLIERS),
+        supplier_id=2,
+        round_num=2,
+    )
+
+    assert [e["type"] for e in ws.events] == ["message", "message_delta", "message_delta", "message_end"]
+    assert ws.events[0]["content"] == "Counter-proposal to supplier 2."
+    assert all(e["supplier_id"] == 2 and e["round"] == 2 for e in ws.events)
+    assert replies[2] == ws.events[-1]["content"]
 
 
 # ---------------------------------------------------------------------------
 # WebSocket — error paths
 # ---------------------------------------------------------------------------
 
-def test_wrong_message_type_returns_error():
-    with TestClient(app) as client:
-        with client.websocket_connect("/ws/negotiate") as ws:
-            ws.send_json({"type": "unknown_event"})
-            response = ws.receive_json()
+class _FailingSupplierAgent(_MockSupplierAgent):
+    """Supplier 1 fails immediately; the others block until cancelled."""
+
+    cancelled: list[int] = []
+
+    async def respond_stream(self, message: str, on_delta) -> str:
+        if self.supplier.id == 1:
+            raise RuntimeError("Supplier A LLM call failed: boom")
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            _FailingSupplierAgent.cancelled.append(self.supplier.id)
+            raise
+        return ""
+
+
+def test_supplier_failure_cancels_siblings_and_reports_error(client):
+    _FailingSupplierAgent.cancelled = []
+    with _negotiation_events(client, supplier_agent=_FailingSupplierAgent) as events:
+        *_, data = events
+    assert data == {"type": "error", "message": "Supplier A LLM call failed: boom"}
+    assert sorted(_FailingSupplierAgent.cancelled) == [2, 3]
+
+
+def test_wrong_message_type_returns_error(client):
+    with client.websocket_connect("/ws/negotiate") as ws:
+        ws.send_json({"type": "unknown_event"})
+        response = ws.receive_json()
     assert response["type"] == "error"
 
 
-def test_invalid_json_returns_error():
-    with TestClient(app) as client:
-        with client.websocket_connect("/ws/negotiate") as ws:
-            ws.send_text("this is not valid json {{{{")
-            response = ws.receive_json()
+def test_socket_is_closed_after_error(client):
+    with client.websocket_connect("/ws/negotiate") as ws:
+        ws.send_json({"type": "unknown_event"})
+        ws.receive_text()
+        assert ws.receive()["type"] == "websocket.close"
+
+
+def test_invalid_json_returns_error(client):
+    with client.websocket_connect("/ws/negotiate") as ws:
+        ws.send_text("this is not valid json {{{{")
+        response = ws.receive_json()
     assert response["type"] == "error"
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import re
+from types import MappingProxyType
+
 import pytest
 from pydantic import ValidationError
 
@@ -11,6 +14,18 @@ from models import (
     NegotiationDecision,
 )
 
+_FIELD_REQUIRED = re.compile(r"Field required")
+_FROZEN = re.compile(r"Instance is frozen")
+
+# Read-only payload templates; tests spread them and override one field.
+_VALID_REQUEST = MappingProxyType({"quantities": {"FSH013": 10000}})
+_VALID_DECISION = MappingProxyType({
+    "winner_supplier_id": 1,
+    "winner_name": "Supplier A",
+    "reasoning": "Best.",
+    "comparison": {},
+})
+
 
 # ---------------------------------------------------------------------------
 # ProductComponent
@@ -34,38 +49,46 @@ class TestProductComponent:
         assert c.composition is None
         assert c.supplier is None
 
-    def test_missing_type_raises(self):
-        with pytest.raises(ValidationError):
-            ProductComponent(name="Eyelet")
-
-    def test_missing_name_raises(self):
-        with pytest.raises(ValidationError):
-            ProductComponent(type="trim")
+    @pytest.mark.parametrize("missing_field", ["type", "name"])
+    def test_missing_required_field_raises(self, missing_field):
+        kwargs = {"type": "trim", "name": "Eyelet"}
+        del kwargs[missing_field]
+        with pytest.raises(ValidationError, match=_FIELD_REQUIRED):
+            ProductComponent(**kwargs)
 
     def test_extra_fields_ignored(self):
         # products.json has fields like color, size, position — model ignores them
         c = ProductComponent(type="trim", name="Eyelet", color="Gunmetal", size="5mm")
         assert c.type == "trim"
 
+    def test_is_frozen(self):
+        c = ProductComponent(type="trim", name="Eyelet")
+        with pytest.raises(ValidationError, match=_FROZEN):
+            c.name = "Lace"
+
 
 # ---------------------------------------------------------------------------
 # Product
 # ---------------------------------------------------------------------------
 
 class TestProduct:
-    _COMPONENT = {"type": "material", "name": "Leather"}
+    # Built once; Pydantic reuses a ready ProductComponent instead of re-validating it.
+    _COMPONENT = ProductComponent(type="material", name="Leather")
+    _BASE = MappingProxyType(dict(
+        code="FSH013",
+        name="Pulse Pro High-Top",
+        description="Premium shoe.",
+        targetFob=14.49,
+        categoryPath="Footwear > Sneakers > High-top Sneakers",
+        components=(_COMPONENT,),
+    ))
 
     def _make(self, **overrides):
-        base = dict(
-            code="FSH013",
-            name="Pulse Pro High-Top",
-            description="Premium shoe.",
-            targetFob=14.49,
-            categoryPath="Footwear > Sneakers > High-top Sneakers",
-            components=[self._COMPONENT],
-        )
-        base.update(overrides)
-        return Product(**base)
+        return Product(**{**self._BASE, **overrides})
+
+    def _make_unchecked(self, **overrides):
+        """Like _make but skips validation — for tests that don't exercise it."""
+        return Product.model_construct(**{**self._BASE, **overrides})
 
     def test_valid_construction(self):
         p = self._make()
@@ -75,42 +98,22 @@ class TestProduct:
 
     def test_empty_components_allowed(self):
         p = self._make(components=[])
-        assert p.components == []
-
-    def test_missing_code_raises(self):
-        with pytest.raises(ValidationError):
-            Product(
-                name="Test",
-                description="desc",
-                targetFob=10.0,
-                categoryPath="A > B",
-                components=[],
-            )
-
-    def test_missing_name_raises(self):
-        with pytest.raises(ValidationError):
-            Product(
-                code="X001",
-                description="desc",
-                targetFob=10.0,
-                categoryPath="A > B",
-                components=[],
-            )
+        assert p.components == ()
+
+    @pytest.mark.parametrize(
+        "missing_field",
+        ["code", "name", "description", "targetFob", "categoryPath", "components"],
+    )
+    def test_missing_required_field_raises(self, missing_field):
+        kwargs = dict(self._BASE)
+        del kwargs[missing_field]
+        with pytest.raises(ValidationError, match=_FIELD_REQUIRED):
+            Product(**kwargs)
 
     def test_target_fob_as_string_raises(self):
-        with pytest.raises(ValidationError):
+        with pytest.raises(ValidationError, match="valid number"):
             self._make(targetFob="not-a-number")
 
-    def test_missing_target_fob_raises(self):
-        with pytest.raises(ValidationError):
-            Product(
-                code="X001",
-                name="Test",
-                description="desc",
-                categoryPath="A > B",
-                components=[],
-            )
-
     def test_components_are_product_component_instances(self):
         p = self._make()
         assert all(isinstance(c, ProductComponent) for c in p.components)
@@ -120,23 +123,32 @@ class TestProduct:
         p = self._make(createdAt="2025-01-01T00:00:00Z", htsCode="6404114900")
         assert p.code == "FSH013"
 
+    def test_is_frozen(self):
+        p = self._make_unchecked()
+        with pytest.raises(ValidationError, match=_FROZEN):
+            p.targetFob = 1.0
+
 
 # ---------------------------------------------------------------------------
 # SupplierProfile
 # ---------------------------------------------------------------------------
 
 class TestSupplierProfile:
+    _BASE = MappingProxyType(dict(
+        id=1,
+        name="Supplier A",
+        quality_rating=4.0,
+        base_lead_time_days=45,
+        payment_terms="33/33/33 (order/shipment/delivery)",
+        price_multiplier=0.85,
+    ))
+
     def _make(self, **overrides):
-        base = dict(
-            id=1,
-            name="Supplier A",
-            quality_rating=4.0,
-            base_lead_time_days=45,
-            payment_terms="33/33/33 (order/shipment/delivery)",
-            price_multiplier=0.85,
-        )
-        base.update(overrides)
-        return SupplierProfile(**base)
+        return SupplierProfile(**{**self._BASE, **overrides})
+
+    def _make_unchecked(self, **overrides):
+        """Like _make but skips validation — for tests that don't exercise it."""
+        return SupplierProfile.model_construct(**{**self._BASE, **overrides})
 
     def test_valid_construction(self):
         s = self._make()
@@ -144,24 +156,29 @@ class TestSupplierProfile:
         assert s.quality_rating == 4.0
         assert s.price_multiplier == 0.85
 
-    def test_missing_id_raises(self):
-        with pytest.raises(ValidationError):
-            SupplierProfile(
-                name="Supplier A",
-                quality_rating=4.0,
-                base_lead_time_days=45,
-                payment_terms="33/33/33",
-                price_multiplier=0.85,
-            )
-
-    def test_missing_name_raises(self):
-        with pytest.raises(ValidationError):
+    @pytest.mark.parametrize(
+        "missing_field",
+        ["id", "name", "quality_rating", "base_lead_time_days", "payment_terms", "price_multiplier"],
+    )
+    def test_missing_required_field_raises(self, missing_field):
+        kwargs = dict(self._BASE)
+        del kwargs[missing_field]
+        with pytest.raises(ValidationError, match=_FIELD_REQUIRED):
+            SupplierProfile(**kwargs)
+
+    def test_none_name_raises(self):
+        with pytest.raises(ValidationError, match="valid string"):
             self._make(name=None)
 
     def test_quality_rating_as_float(self):
         s = self._make(quality_rating=4.7)
         assert s.quality_rating == 4.7
 
+    def test_is_frozen(self):
+        s = self._make_unchecked()
+        with pytest.raises(ValidationError, match=_FROZEN):
+            s.price_multiplier = 0.5
+
 
 # ---------------------------------------------------------------------------
 # NegotiationRequest
@@ -169,20 +186,24 @@ class TestSupplierProfile:
 
 class TestNegotiationRequest:
     def test_valid_with_note(self):
-        r = NegotiationRequest(quantities={"FSH013": 10000}, note="Prioritise speed.")
+        r = NegotiationRequest.model_validate({**_VALID_REQUEST, "note": "Prioritise speed."})
         assert r.note == "Prioritise speed."
 
     def test_note_defaults_to_none(self):
-        r = NegotiationRequest(quantities={"FSH013": 10000})
+        r = NegotiationRequest.model_validate(_VALID_REQUEST)
         assert r.note is None
 
+    def test_batch_defaults_to_false(self):
+        r = NegotiationRequest.model_validate(_VALID_REQUEST)
+        assert r.batch is False
+
     def test_missing_quantities_raises(self):
-        with pytest.raises(ValidationError):
-            NegotiationRequest()
+        with pytest.raises(ValidationError, match=_FIELD_REQUIRED):
+            NegotiationRequest.model_validate({})
 
     def test_quantities_type_coercion(self):
         # Pydantic coerces numeric strings to int for dict[str, int]
-        r = NegotiationRequest(quantities={"FSH013": 1000})
+        r = NegotiationRequest.model_validate({**_VALID_REQUEST, "quantities": {"FSH013": 1000}})
         assert r.quantities["FSH013"] == 1000
 
 
@@ -190,47 +211,40 @@ class TestNegotiationRequest:
 # NegotiationDecision
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(scope="session")
+def negotiation_decision() -> NegotiationDecision:
+    """Validated once; the happy-path tests only read it."""
+    return NegotiationDecision.model_validate({
+        **_VALID_DECISION,
+        "winner_supplier_id": 2,
+        "winner_name": "Supplier B",
+        "comparison": {
+            "Supplier B": {
+                "cost_assessment": "mid-range",
+                "quality_assessment": "High",
+                "lead_time_assessment": "Moderate",
+                "payment_terms_assessment": "Standard",
+                "overall_score": "8/10",
+            }
+        },
+    })
+
+
 class TestNegotiationDecision:
-    def test_valid_construction(self):
-        d = NegotiationDecision(
-            winner_supplier_id=2,
-            winner_name="Supplier B",
-            reasoning="Best quality-to-cost ratio.",
-            comparison={"Supplier B": {"cost_assessment": "mid-range"}},
-        )
-        assert d.winner_supplier_id == 2
-        assert d.winner_name == "Supplier B"
-        assert isinstance(d.comparison, dict)
-
-    def test_missing_winner_id_raises(self):
-        with pytest.raises(ValidationError):
-            NegotiationDecision(
-                winner_name="Supplier B",
-                reasoning="Best.",
-                comparison={},
-            )
-
-    def test_missing_reasoning_raises(self):
-        with pytest.raises(ValidationError):
-            NegotiationDecision(
-                winner_supplier_id=1,
-                winner_name="Supplier A",
-                comparison={},
-            )
-
-    def test_comparison_accepts_arbitrary_dict(self):
-        d = NegotiationDecision(
-            winner_supplier_id=1,
-            winner_name="Supplier A",
-            reasoning="Cheapest.",
-            comparison={
-                "Supplier A": {
-                    "cost_assessment": "Low",
-                    "quality_assessment": "Medium",
-                    "lead_time_assessment": "Slow",
-                    "payment_terms_assessment": "Flexible",
-                    "overall_score": "7/10",
-                }
-            },
-        )
-        assert "Supplier A" in d.comparison
+    def test_valid_construction(self, negotiation_decision):
+        assert negotiation_decision.winner_supplier_id == 2
+        assert negotiation_decision.winner_name == "Supplier B"
+        assert isinstance(negotiation_decision.comparison, dict)
+
+    @pytest.mark.parametrize(
+        "missing_field",
+        ["winner_supplier_id", "winner_name", "reasoning", "comparison"],
+    )
+    def test_missing_required_field_raises(self, missing_field):
+        data = dict(_VALID_DECISION)
+        del data[missing_field]
+        with pytest.raises(ValidationError, match=_FIELD_REQUIRED):
+            NegotiationDecision.model_validate(data)
+
+    def test_comparison_accepts_arbitrary_dict(self, negotiation_decision):
+        assert negotiation_decision.comparison["Supplier B"]["overall_score"] == "8/10"
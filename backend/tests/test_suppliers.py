@@ -2,14 +2,30 @@ from __future__ import annotations
 
 import pytest
 
+import suppliers
 from suppliers import load_products, get_supplier, SUPPLIERS
 from models import Product, SupplierProfile
 
+_EXPECTED_CODES = frozenset({"FSH013", "FSH014", "FSH016", "FSH019", "FSH021"})
+_EXPECTED_IDS = frozenset({1, 2, 3})
+_EXPECTED_SUPPLIER_ORDER = ("Supplier A", "Supplier B", "Supplier C")
+
 
 # ---------------------------------------------------------------------------
 # load_products
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(scope="session")
+def product_columns(products) -> dict[str, tuple]:
+    """Per-field columns of the catalog, extracted once for the whole session."""
+    return {
+        "code": tuple(p.code for p in products),
+        "name": tuple(p.name for p in products),
+        "targetFob": tuple(p.targetFob for p in products),
+        "components_len": tuple(len(p.components) for p in products),
+    }
+
+
 class TestLoadProducts:
     def test_returns_exactly_five_products(self, products):
         assert len(products) == 5
@@ -17,21 +33,20 @@ class TestLoadProducts:
     def test_all_items_are_product_instances(self, products):
         assert all(isinstance(p, Product) for p in products)
 
-    def test_all_codes_are_non_empty(self, products):
-        assert all(p.code for p in products)
+    def test_all_codes_are_non_empty(self, product_columns):
+        assert all(product_columns["code"])
 
-    def test_all_names_are_non_empty(self, products):
-        assert all(p.name for p in products)
+    def test_all_names_are_non_empty(self, product_columns):
+        assert all(product_columns["name"])
 
-    def test_all_target_fobs_are_positive(self, products):
-        assert all(p.targetFob > 0 for p in products)
+    def test_all_target_fobs_are_positive(self, product_columns):
+        assert min(product_columns["targetFob"]) > 0
 
-    def test_all_products_have_at_least_one_component(self, products):
-        assert all(len(p.components) > 0 for p in products)
+    def test_all_products_have_at_least_one_component(self, product_columns):
+        assert min(product_columns["components_len"]) > 0
 
-    def test_expected_product_codes_present(self, products):
-        codes = {p.code for p in products}
-        assert codes == {"FSH013", "FSH014", "FSH016", "FSH019", "FSH021"}
+    def test_expected_product_codes_present(self, product_columns):
+        assert frozenset(product_columns["code"]) == _EXPECTED_CODES
 
     def test_pulse_pro_high_top_present(self, products):
         names = [p.name for p in products]
@@ -39,9 +54,22 @@ class TestLoadProducts:
 
     def test_products_are_reloaded_each_call(self):
         """load_products() should be a pure function — two calls return equal data."""
-        a = load_products()
-        b = load_products()
-        assert [p.code for p in a] == [p.code for p in b]
+        a_codes = tuple(p.code for p in load_products())
+        b_codes = tuple(p.code for p in load_products())
+        assert a_codes == b_codes
+
+    def test_products_are_parsed_once(self):
+        assert load_products() is load_products()
+
+    def test_cached_catalog_is_immutable(self):
+        assert isinstance(load_products(), tuple)
+
+    def test_extra_top_level_keys_are_ignored(self, tmp_path, monkeypatch):
+        catalog = tmp_path / "products.json"
+        catalog.write_bytes(suppliers._PRODUCTS_PATH.read_bytes().replace(b"{", b'{"version": "2", ', 1))
+        monkeypatch.setattr(suppliers, "_PRODUCTS_PATH", catalog)
+        # __wrapped__ bypasses the lru_cache so the patched path is actually read.
+        assert tuple(p.code for p in load_products.__wrapped__()) == tuple(p.code for p in load_products())
 
 
 # ---------------------------------------------------------------------------
@@ -49,16 +77,13 @@ class TestLoadProducts:
 # ---------------------------------------------------------------------------
 
 class TestGetSupplier:
-    @pytest.mark.parametrize("supplier_id,expected_name", [
-        (1, "Supplier A"),
-        (2, "Supplier B"),
-        (3, "Supplier C"),
-    ])
-    def test_returns_correct_supplier(self, supplier_id, expected_name):
-        s = get_supplier(supplier_id)
-        assert isinstance(s, SupplierProfile)
-        assert s.id == supplier_id
-        assert s.name == expected_name
+    def test_returns_correct_supplier(self, subtests):
+        for supplier_id, expected_name in enumerate(_EXPECTED_SUPPLIER_ORDER, start=1):
+            with subtests.test(supplier_id=supplier_id):
+                s = get_supplier(supplier_id)
+                assert isinstance(s, SupplierProfile)
+                assert s.id == supplier_id
+                assert s.name == expected_name
 
     def test_raises_value_error_for_unknown_id(self):
         with pytest.raises(ValueError):
@@ -77,37 +102,48 @@ class TestGetSupplier:
 # SUPPLIERS list integrity
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(scope="session")
+def supplier_by_id() -> dict[int, SupplierProfile]:
+    return {s.id: s for s in SUPPLIERS}
+
+
+@pytest.fixture(scope="session")
+def prices(supplier_by_id) -> dict[int, float]:
+    return {i: s.price_multiplier for i, s in supplier_by_id.items()}
+
+
+@pytest.fixture(scope="session")
+def lead_times(supplier_by_id) -> dict[int, int]:
+    return {i: s.base_lead_time_days for i, s in supplier_by_id.items()}
+
+
 class TestSuppliersList:
     def test_exactly_three_suppliers(self):
         assert len(SUPPLIERS) == 3
 
     def test_supplier_names_in_order(self):
-        assert [s.name for s in SUPPLIERS] == ["Supplier A", "Supplier B", "Supplier C"]
-
-    def test_supplier_ids_are_1_2_3(self):
-        assert {s.id for s in SUPPLIERS} == {1, 2, 3}
+        assert tuple(s.name for s in SUPPLIERS) == _EXPECTED_SUPPLIER_ORDER
 
-    def test_supplier_quality_ratings(self):
-        ratings = {s.id: s.quality_rating for s in SUPPLIERS}
-        assert ratings[1] == 4.0   # medium quality
-        assert ratings[2] == 4.7   # high quality
-        assert ratings[3] == 4.0   # medium quality
+    def test_supplier_ids_are_1_2_3(self, supplier_by_id):
+        assert frozenset(supplier_by_id) == _EXPECTED_IDS
 
-    def test_supplier_payment_terms(self):
-        terms = {s.id: s.payment_terms for s in SUPPLIERS}
-        assert "33/33/33" in terms[1]
-        assert "30/70" in terms[2]
-        assert "30/70" in terms[3]
+    @pytest.mark.parametrize("supplier_id,rating,terms", [
+        (1, 4.0, "33/33/33"),  # medium quality
+        (2, 4.7, "30/70"),     # high quality
+        (3, 4.0, "30/70"),     # medium quality
+    ])
+    def test_supplier_rating_and_terms(self, supplier_by_id, supplier_id, rating, terms):
+        s = supplier_by_id[supplier_id]
+        assert s.quality_rating == rating
+        assert terms in s.payment_terms
 
-    def test_price_multiplier_ordering(self):
+    def test_price_multiplier_ordering(self, prices):
         """Supplier 1 cheapest, Supplier 3 most expensive."""
-        m = {s.id: s.price_multiplier for s in SUPPLIERS}
-        assert m[1] < m[2] < m[3]
+        assert prices[1] < prices[2] < prices[3]
 
-    def test_lead_time_ordering(self):
+    def test_lead_time_ordering(self, lead_times):
         """Supplier 3 fastest, Supplier 1 slowest."""
-        lt = {s.id: s.base_lead_time_days for s in SUPPLIERS}
-        assert lt[3] < lt[2] < lt[1]
+        assert lead_times[3] < lead_times[2] < lead_times[1]
 
-    def test_all_suppliers_have_positive_lead_time(self):
-        assert all(s.base_lead_time_days > 0 for s in SUPPLIERS)
+    def test_all_suppliers_have_positive_lead_time(self, lead_times):
+        assert all(lt > 0 for lt in lead_times.values())
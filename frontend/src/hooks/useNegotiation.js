@@ -42,6 +42,48 @@ export function useNegotiation() {
           ])
           break
 
+        case 'message_delta':
+          // Append to the open bubble for this supplier turn, or open a new one
+          setMessages((prev) => {
+            const idx = prev.findIndex(
+              (m) => m.streaming && m.supplier_id === data.supplier_id && m.round === data.round,
+            )
+            if (idx === -1) {
+              return [
+                ...prev,
+                {
+                  supplier_id: data.supplier_id,
+                  role: data.role,
+                  content: data.chunk,
+                  round: data.round ?? 0,
+                  streaming: true,
+                },
+              ]
+            }
+            const next = [...prev]
+            next[idx] = { ...next[idx], content: next[idx].content + data.chunk }
+            return next
+          })
+          break
+
+        case 'message_end':
+          setMessages((prev) => {
+            const idx = prev.findIndex(
+              (m) => m.streaming && m.supplier_id === data.supplier_id && m.round === data.round,
+            )
+            const final = {
+              supplier_id: data.supplier_id,
+              role: data.role,
+              content: data.content,
+              round: data.round ?? 0,
+            }
+            if (idx === -1) return [...prev, final]
+            const next = [...prev]
+            next[idx] = final
+            return next
+          })
+          break
+
         case 'status':
           setStatusText(data.message)
           break
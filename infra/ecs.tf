@@ -97,7 +97,8 @@ resource "aws_ecs_task_definition" "app" {
     }]
 
     environment = [
-      { name = "MODEL_NAME", value = var.model_name },
+      { name = "SMALL_MODEL_NAME", value = var.small_model_name },
+      { name = "LARGE_MODEL_NAME", value = var.large_model_name },
     ]
 
     secrets = [{
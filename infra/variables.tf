@@ -33,7 +33,12 @@ variable "desired_count" {
   default = 1
 }
 
-variable "model_name" {
+variable "small_model_name" {
+  type    = string
+  default = "gpt-4o-mini"
+}
+
+variable "large_model_name" {
   type    = string
   default = "gpt-4o"
 }